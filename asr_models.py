@@ -0,0 +1,155 @@
+#------------------------------------------
+# asr_models.py
+#------------------------------------------
+# Lazy model factory shared by the transcription scripts.
+# torch, faster_whisper, whisperx and epitran are imported, and each model is
+# built, only the first time it is asked for. After that the same instance is
+# returned for the whole life of the process (or of the worker).
+
+import json
+import os
+import sys
+import threading
+
+from audio_cache import CACHE_DIR
+
+# Written by calibrate_asr.py: best compute type / threads / workers per model size
+PROFILE_PATH = CACHE_DIR / "asr_profile.json"
+
+_lock = threading.Lock()
+_asr_models = {}
+_batched_pipelines = {}
+_align_models = {}
+_onnx_align_models = {}
+_g2p = {}
+_torch_threads = {}
+
+
+def load_profile(model_size) -> dict:
+    """Calibrated settings for `model_size` on this machine ({} if none)."""
+    if not PROFILE_PATH.exists():
+        return {}
+    try:
+        with open(PROFILE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f).get(model_size, {})
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read calibration profile {PROFILE_PATH}: {e}")
+        return {}
+
+
+def get_asr_model(model_size, cpu_threads=8, compute_type="int8", num_workers=1):
+    """
+    faster-whisper model on CPU, `compute_type` with a float32 fallback.
+    The first call for a model size / compute type decides the thread count
+    and the number of CTranslate2 workers (num_workers > 1: that many threads
+    can transcribe at the same time with one loaded model); later calls
+    return the same instance.
+    """
+    key = (model_size, compute_type)
+    with _lock:
+        if key not in _asr_models:
+            from faster_whisper import WhisperModel
+            options = {"device": "cpu", "cpu_threads": cpu_threads, "num_workers": num_workers}
+            try:
+                model = WhisperModel(model_size, compute_type=compute_type, **options)
+            except ValueError:
+                model = WhisperModel(model_size, compute_type="float32", **options)
+            workers = f", {num_workers} workers" if num_workers > 1 else ""
+            print(f"Whisper model loaded: {model_size} on CPU ({cpu_threads} threads{workers})")
+            _asr_models[key] = model
+        return _asr_models[key]
+
+
+def get_batched_pipeline(model_size, cpu_threads=8, compute_type="int8"):
+    """faster-whisper BatchedInferencePipeline around the same ASR model."""
+    model = get_asr_model(model_size, cpu_threads, compute_type)
+    key = (model_size, compute_type)
+    with _lock:
+        if key not in _batched_pipelines:
+            from faster_whisper import BatchedInferencePipeline
+            _batched_pipelines[key] = BatchedInferencePipeline(model=model)
+        return _batched_pipelines[key]
+
+
+def set_torch_threads(intra, inter=1):
+    """
+    Thread counts for torch (align model). Applied now if torch is already
+    imported, otherwise as soon as it is; without a call torch keeps its
+    default (one thread per core, whatever CTranslate2 is using).
+    """
+    _torch_threads.update(intra=intra, inter=inter)
+    if "torch" in sys.modules:
+        _apply_torch_threads()
+
+
+def _apply_torch_threads():
+    import torch
+
+    if not _torch_threads:
+        return
+    torch.set_num_threads(_torch_threads["intra"])
+    try:
+        torch.set_num_interop_threads(_torch_threads["inter"])
+    except RuntimeError:
+        pass  # only settable once, before any inter-op work
+
+
+def get_align_device():
+    """'mps' on Apple Silicon, otherwise 'cpu'. Imports torch on first call."""
+    os.environ.setdefault("PYTORCH_ENABLE_MPS_FALLBACK", "1")
+    import torch
+    _apply_torch_threads()
+    return "mps" if torch.backends.mps.is_available() else "cpu"
+
+
+def get_align_model(language):
+    """WhisperX wav2vec2 align model: (model, metadata, device)."""
+    with _lock:
+        if language not in _align_models:
+            import whisperx
+            device = get_align_device()
+            model, meta = whisperx.load_align_model(language_code=language, device=device)
+            print(f"ALIGN model loaded: {language} on {device}")
+            _align_models[language] = (model, meta, device)
+        return _align_models[language]
+
+
+def get_onnx_align_model(language, quantized=False, threads=0):
+    """
+    ONNX Runtime session of the align model and its metadata: (session, meta).
+    The model is exported from the torch one the first time (onnx_align.py);
+    with several workers transcrive.py exports it before the pool starts, so
+    they only load it.
+    threads=0 lets onnxruntime pick.
+    """
+    import onnx_align
+
+    key = (language, quantized)
+    path = onnx_align.onnx_path(language, quantized)
+    if not path.exists():
+        # outside the lock: the export loads the torch model through get_align_model
+        onnx_align.export(language, quantized)
+    with _lock:
+        if key not in _onnx_align_models:
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = threads
+            session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+            print(f"ALIGN model loaded: {path.name} (onnxruntime)")
+            _onnx_align_models[key] = (session, onnx_align.load_meta(language))
+        return _onnx_align_models[key]
+
+
+def get_g2p(code="ita-Latn"):
+    """Epitran instance, or None if Epitran is not available."""
+    with _lock:
+        if code not in _g2p:
+            try:
+                import epitran
+                _g2p[code] = epitran.Epitran(code)
+                print(f"[G2P] Epitran attivo ({code})")
+            except Exception as e:
+                print(f"[G2P] Epitran non disponibile ({e}); il tier g2p_lex verrà omesso.")
+                _g2p[code] = None
+        return _g2p[code]
@@ -0,0 +1,147 @@
+#------------------------------------------
+# asr_pool.py
+#------------------------------------------
+# Worker pool shared by transcrive.py and transcrive_txt.py.
+# Each worker is a separate process that loads its own model once (through
+# the initializer) and then pulls files from a shared queue, one at a time.
+# run_threads is the same pool on threads of one process, so the models are
+# loaded once for all the workers; memory_usage measures what a pool takes,
+# measure_rtf how fast it goes (calibrate_asr.py, bench_threads.py).
+
+import multiprocessing as mp
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+
+def split_threads(total_threads: int, workers: int) -> int:
+    """Share of the thread budget that each worker gets (at least 1)."""
+    workers = max(1, workers)
+    return max(1, total_threads // workers)
+
+
+def plan_threads(total_threads: int, workers: int, overlap=False, align_share=0.5) -> dict:
+    """
+    Split the thread budget between worker processes and, inside each worker,
+    between CTranslate2 (ASR) and torch (alignment).
+    Without `overlap` ASR and alignment of a worker run one after the other,
+    so both get the whole share; with `overlap` (staged pipeline) they run at
+    the same time and torch gets `align_share` of it. torch inter-op
+    parallelism is not used by the align model: one thread.
+    """
+    share = split_threads(total_threads, workers)
+    torch_intra = max(1, round(share * align_share)) if overlap else share
+    ct2 = max(1, share - torch_intra) if overlap and share > 1 else share
+    return {"workers": max(1, workers), "ct2": ct2, "torch_intra": torch_intra, "torch_inter": 1}
+
+
+def _call(job_and_item):
+    """Run one job inside a worker and never let an exception kill the pool."""
+    job, item = job_and_item
+    try:
+        return item, job(item), None
+    except Exception as e:
+        # the message is sent back as text: not every exception can be pickled
+        return item, None, str(e)
+
+
+def run_pool(items, job, workers, initializer=None, initargs=(), start_method="spawn"):
+    """
+    Run job(item) for every item on `workers` processes.
+    Yields (item, result, error) as soon as each item is finished, so the
+    caller can print results and errors exactly like the sequential loop.
+    """
+    items = list(items)
+    # "spawn" is the macOS default and avoids forking a process that already
+    # holds torch / CTranslate2 thread pools. "fork" lets the workers share,
+    # copy-on-write, whatever the parent loaded before (as long as it started
+    # no threads).
+    ctx = mp.get_context(start_method)
+    with ctx.Pool(processes=workers, initializer=initializer, initargs=initargs) as pool:
+        # chunksize=1: every idle worker takes the next file from the queue
+        yield from pool.imap_unordered(_call, [(job, it) for it in items], chunksize=1)
+
+
+def run_threads(items, job, workers, initializer=None, initargs=()):
+    """
+    run_pool on `workers` threads of this process: the initializer runs once,
+    and every thread uses the models it loaded (CTranslate2 and torch release
+    the GIL while they compute). Same (item, result, error) results.
+    """
+    if initializer is not None:
+        initializer(*initargs)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_call, (job, it)) for it in items]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+_measured = {}
+
+
+def _measure_init(setup, args, barrier):
+    _measured.update(state=setup(*args), barrier=barrier)
+
+
+def _measure_run(run):
+    # every worker starts together, once all models are loaded
+    _measured["barrier"].wait()
+    t0 = time.perf_counter()
+    run(_measured["state"])
+    return time.perf_counter() - t0
+
+
+def measure_rtf(workers, seconds, setup, args, run) -> float:
+    """
+    Aggregate RTF of `workers` spawned processes each working on `seconds` of
+    audio at once. Every worker calls setup(*args) once (model loading, not
+    timed); then all of them call run(state) on what it returned, together.
+    setup and run must be module-level functions (they are pickled).
+    """
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    with ctx.Pool(workers, initializer=_measure_init, initargs=(setup, args, barrier)) as pool:
+        elapsed = pool.map(_measure_run, [run] * workers, chunksize=1)
+    return max(elapsed) / (seconds * workers)
+
+
+def pool_pids():
+    """This process and its live child processes (the workers of a pool)."""
+    return [os.getpid()] + [p.pid for p in mp.active_children()]
+
+
+def _smaps_rollup(pid) -> dict:
+    fields = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        key, _, value = line.partition(":")
+        parts = value.split()
+        if len(parts) == 2 and parts[1] == "kB":
+            fields[key] = int(parts[0]) * 1024
+    return fields
+
+
+def memory_usage(pids) -> dict:
+    """
+    {"processes", "rss", "pss"} of a group of processes, in bytes.
+    RSS counts a page shared by several processes once in each of them; PSS
+    splits it among them, so the PSS total is what the group really takes.
+    PSS is read from /proc/<pid>/smaps_rollup (Linux); elsewhere it is None
+    and RSS comes from ps.
+    """
+    rss, pss, n = 0, 0, 0
+    for pid in pids:
+        try:
+            if Path("/proc/self/smaps_rollup").exists():
+                fields = _smaps_rollup(pid)
+                rss += fields.get("Rss", 0)
+                pss += fields.get("Pss", 0)
+            else:
+                out = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout
+                rss += int(out.strip() or 0) * 1024
+                pss = None
+        except (OSError, ValueError):
+            continue  # the process is gone
+        n += 1
+    return {"processes": n, "rss": rss, "pss": pss}
@@ -0,0 +1,106 @@
+#------------------------------------------
+# audio_cache.py
+#------------------------------------------
+# Decoded-audio cache shared by ASR and alignment.
+# Each audio file is decoded once to 16 kHz mono float32 PCM and stored under
+# CACHE_DIR/audio/<sha256>.f32. Later reads are memory-mapped, so faster-whisper
+# and whisperx.align get the same samples without decoding the mp3 again, and
+# repeated runs skip decoding entirely.
+#
+# The key is the hash of the file content, not its name: the same recording
+# copied into laureato/ or non-laureato/ hits the same cache entry.
+
+import hashlib
+import os
+from pathlib import Path
+
+from stage_timing import timed
+
+# --------- CONFIG ---------
+CACHE_DIR = Path.home() / ".cache" / "jr_corpus"  # <--- CHANGE HERE (shared by all the caches)
+SAMPLE_RATE = 16000
+
+_hash_memo = {}
+
+
+def audio_hash(path) -> str:
+    """sha256 of the file content (memoized per path/size/mtime in this process)."""
+    path = Path(path)
+    st = path.stat()
+    memo_key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+    if memo_key not in _hash_memo:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        _hash_memo[memo_key] = h.hexdigest()
+    return _hash_memo[memo_key]
+
+
+def cached_pcm_path(path) -> Path:
+    return CACHE_DIR / "audio" / f"{audio_hash(path)}.f32"
+
+
+def cached_duration(path):
+    """Duration in seconds if the file is already decoded in the cache, else None."""
+    pcm = cached_pcm_path(path)
+    if not pcm.exists():
+        return None
+    return pcm.stat().st_size / 4 / SAMPLE_RATE  # float32 = 4 bytes per sample
+
+
+def load_audio(path):
+    """
+    16 kHz mono float32 samples of `path`, as a copy-on-write np.memmap.
+    The first call decodes the file (faster-whisper / PyAV) and fills the cache.
+    """
+    import numpy as np
+
+    pcm = cached_pcm_path(path)
+    if not pcm.exists():
+        from faster_whisper import decode_audio
+
+        with timed("decode"):
+            audio = decode_audio(str(path), sampling_rate=SAMPLE_RATE).astype(np.float32, copy=False)
+        pcm.parent.mkdir(parents=True, exist_ok=True)
+        # write then rename: a crash or a parallel worker never sees half a file
+        tmp = pcm.with_name(f"{pcm.name}.{os.getpid()}.tmp")
+        audio.tofile(tmp)
+        os.replace(tmp, pcm)
+
+    if pcm.stat().st_size == 0:
+        return np.zeros(0, dtype=np.float32)
+    # mode "c": pages are shared with the page cache, writes stay private
+    return np.memmap(pcm, dtype=np.float32, mode="c")
+
+
+class WindowedAudio:
+    """
+    Read-only view of a decoded PCM file: each slice is read from disk on
+    demand (np.fromfile), nothing is mapped, so only the samples asked for are
+    ever in the process memory, however long the recording.
+    Supports len() and contiguous slices, which is all the aligners use.
+    """
+
+    def __init__(self, pcm_path):
+        self.pcm = Path(pcm_path)
+        self.n_samples = self.pcm.stat().st_size // 4
+
+    def __len__(self):
+        return self.n_samples
+
+    def __getitem__(self, key):
+        import numpy as np
+
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("WindowedAudio supports contiguous slices only")
+        start, stop, _ = key.indices(self.n_samples)
+        return np.fromfile(self.pcm, dtype=np.float32, count=max(stop - start, 0), offset=start * 4)
+
+
+def open_windowed(path) -> WindowedAudio:
+    """Like load_audio, but returns a WindowedAudio instead of a memmap."""
+    pcm = cached_pcm_path(path)
+    if not pcm.exists():
+        load_audio(path)  # decode once into the cache
+    return WindowedAudio(pcm)
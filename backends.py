@@ -0,0 +1,382 @@
+#------------------------------------------
+# backends.py
+#------------------------------------------
+# ASR and alignment backends.
+# The pipeline asks two kinds of model for work, through these protocols:
+#   ASRBackend.transcribe(audio, settings, cpu_threads, initial_prompt, speech_chunks)
+#       -> segment dicts {"start", "end", "text", ...}, seconds from the start
+#          of `audio` (transcription.iter_segments adds the offset and maps the
+#          times back when only the speech was decoded)
+#   ASRBackend.speech_timestamps(audio, vad_parameters)
+#       -> the speech regions used with vad_filter=True (vad_cache)
+#   AlignBackend.align({audio_path: (audio, segments)})
+#       -> {audio_path: [aligned segments of each input segment]}, the
+#          align_fn of segment_align_cache.align_cached
+# get_backend(kind, spec) builds one from a name or {"name": ..., **options}.
+#
+# "faster-whisper" and "whisperx" (wav2vec2, with the torch or ONNX runtime)
+# are the real backends. The "fake" ones need no model: they turn synthetic
+# audio (tone bursts separated by silences, written by `synth`) into
+# deterministic segments, words and phones, taking a configurable time per
+# second of audio. With them file discovery, VAD, caches, resume, txt /
+# TextGrid / JSON writing and the stage timing run offline (tests/), and
+# their outputs can be compared from one run to the next.
+#
+#   python backends.py synth fake_audio/ --files 4 --seconds 120
+#
+# then in transcrive.py: AUDIO_DIR = Path("fake_audio"), ASR_BACKEND = "fake",
+# ALIGN_BACKEND = "fake" (FAKE_RTF sets the simulated speed).
+
+import argparse
+import os
+import time
+import wave
+from pathlib import Path
+from typing import Iterator, Protocol
+
+from audio_cache import SAMPLE_RATE, cached_pcm_path
+
+
+class ASRBackend(Protocol):
+    name: str
+
+    def load(self, settings: dict, cpu_threads=8, num_workers=1) -> None:
+        ...
+
+    def speech_timestamps(self, audio, vad_parameters: dict) -> list:
+        ...
+
+    def transcribe(self, audio, settings: dict, cpu_threads=8, initial_prompt=None,
+                   speech_chunks=None) -> Iterator[dict]:
+        ...
+
+
+class AlignBackend(Protocol):
+    name: str
+
+    def load(self) -> None:
+        ...
+
+    def align(self, jobs: dict) -> dict:
+        ...
+
+
+# --------- REAL BACKENDS ---------
+class FasterWhisperASR:
+    """faster-whisper on CPU (asr_models), sequential or batched
+    (settings["batch_size"] > 0, BatchedInferencePipeline)."""
+    name = "faster-whisper"
+
+    def load(self, settings, cpu_threads=8, num_workers=1):
+        from asr_models import get_asr_model
+        get_asr_model(settings["model_size"], cpu_threads, settings["compute_type"], num_workers)
+
+    def speech_timestamps(self, audio, vad_parameters):
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        return get_speech_timestamps(audio, VadOptions(**vad_parameters))
+
+    def transcribe(self, audio, settings, cpu_threads=8, initial_prompt=None, speech_chunks=None):
+        """
+        `speech_chunks` ({"start", "end"} in samples) are the clips of the
+        batched pipeline, in place of its own VAD pass; both modes get only
+        the speech already (see transcription.iter_segments).
+        settings["condition_on_previous_text"] / settings["without_timestamps"],
+        if present, go to faster-whisper as they are (see escalation).
+        """
+        from asr_models import get_asr_model, get_batched_pipeline
+
+        options = dict(
+            language=settings["language"],
+            vad_filter=settings["vad_filter"],
+            vad_parameters=settings["vad_parameters"],
+            initial_prompt=initial_prompt,
+            word_timestamps=bool(settings.get("word_timestamps")),
+        )
+        for option in ("condition_on_previous_text", "without_timestamps"):
+            if option in settings:
+                options[option] = settings[option]
+        if settings.get("batch_size"):
+            pipeline = get_batched_pipeline(settings["model_size"], cpu_threads, settings["compute_type"])
+            if speech_chunks is not None:
+                options["vad_filter"] = False
+                options["clip_timestamps"] = [{"start": c["start"] / SAMPLE_RATE, "end": c["end"] / SAMPLE_RATE}
+                                              for c in speech_chunks]
+            else:
+                # the batched pipeline always splits on VAD chunks
+                options["vad_filter"] = True
+            seg_gen, info = pipeline.transcribe(audio, batch_size=settings["batch_size"], **options)
+        else:
+            seg_gen, info = get_asr_model(settings["model_size"], cpu_threads,
+                                          settings["compute_type"]).transcribe(audio, **options)
+
+        for s in seg_gen:
+            seg = {"start": float(s.start), "end": float(s.end), "text": s.text,
+                   "avg_logprob": s.avg_logprob, "no_speech_prob": s.no_speech_prob,
+                   "compression_ratio": s.compression_ratio}
+            if s.words is not None:
+                seg["words"] = [{"word": w.word, "start": float(w.start), "end": float(w.end),
+                                 "probability": w.probability} for w in s.words]
+            yield seg
+
+
+class WhisperXAligner:
+    """
+    wav2vec2 forced alignment of whisperx: one segment at a time
+    (whisperx.align), on windows read from disk (`window_pad`, see
+    windowed_align), in length-bucketed batches (`batch_size`, see
+    batched_align), or on the ONNX export of the model (runtime "onnx" /
+    "onnx-int8", see onnx_align).
+    """
+    name = "whisperx"
+
+    def __init__(self, language="it", runtime="torch", batch_size=0, window_pad=None, threads=0):
+        self.language = language
+        self.runtime = runtime
+        self.batch_size = batch_size
+        self.window_pad = window_pad
+        self.threads = threads
+
+    def load(self):
+        from asr_models import get_align_model, get_onnx_align_model
+
+        if self.runtime == "torch":
+            return get_align_model(self.language)
+        return get_onnx_align_model(self.language, self.runtime == "onnx-int8", self.threads)
+
+    def align(self, jobs):
+        from batched_align import align_files
+
+        if self.runtime != "torch":
+            from onnx_align import emissions_onnx
+            session, meta = self.load()
+            aligned = align_files(jobs, session, meta, None, self.batch_size or 16, emissions_fn=emissions_onnx)
+            return {ap: [[seg] for seg in a["segments"]] for ap, a in aligned.items()}
+        model, meta, device = self.load()
+        if self.batch_size:
+            aligned = align_files(jobs, model, meta, device, self.batch_size)
+            return {ap: [[seg] for seg in a["segments"]] for ap, a in aligned.items()}
+        if self.window_pad is not None:
+            from windowed_align import align_segment_windowed
+            return {ap: [align_segment_windowed(seg, audio, model, meta, device, self.window_pad)
+                         for seg in segments]
+                    for ap, (audio, segments) in jobs.items()}
+        import whisperx
+        # whisperx.align aligns one segment at a time anyway
+        return {ap: [whisperx.align([seg], model, meta, audio, device)["segments"] for seg in segments]
+                for ap, (audio, segments) in jobs.items()}
+
+
+# --------- FAKE BACKENDS ---------
+FRAME = SAMPLE_RATE // 100    # 10 ms energy frames
+SPEECH_RMS = 0.02             # frames above this are "speech"
+LAST_WORD_PEAK = 0.4          # a louder burst is the last word of its utterance
+FAKE_VAD = {"min_silence_duration_ms": 500, "speech_pad_ms": 100}  # unless vad_parameters say otherwise
+
+# Words of the fake transcripts; several of them have candidates for the
+# Scripts_JR detectors (feature_targets), so targeted alignment has work too.
+# Word k is a tone at word_frequency(k): the fake ASR reads it from the audio
+# itself, so the transcript does not depend on where decoding starts.
+VOCABULARY = ["casa", "velocemente", "città", "perché", "gente", "scienza", "ragazzo", "sempre", "anche",
+              "pizza", "figlio", "giorno", "chiesa", "viaggio", "quando", "tanto", "sbaglio", "rosa",
+              "finalmente", "uomo", "piede", "scuola", "cosa", "lavoro"]
+
+
+def word_frequency(k) -> float:
+    return 110.0 + 10.0 * k
+
+
+def bursts(audio):
+    """[(start, end, word, last)] of the runs of speech frames (seconds from
+    the start of `audio`); `last`: the burst ends its utterance."""
+    import numpy as np
+
+    n = len(audio) // FRAME
+    if n == 0:
+        return []
+    frames = np.asarray(audio[: n * FRAME], dtype=np.float32).reshape(n, FRAME)
+    speech = np.sqrt((frames ** 2).mean(axis=1)) > SPEECH_RMS
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], speech.astype(np.int8), [0]])))
+    out = []
+    for s, e in zip(edges[::2], edges[1::2]):
+        tone = frames[s:e].ravel()
+        # a tone of f Hz crosses zero 2f times a second
+        freq = np.count_nonzero(np.diff(np.signbit(tone))) * SAMPLE_RATE / (2 * len(tone))
+        k = min(max(int(round((freq - word_frequency(0)) / 10.0)), 0), len(VOCABULARY) - 1)
+        out.append((float(s * FRAME / SAMPLE_RATE), float(e * FRAME / SAMPLE_RATE), VOCABULARY[k],
+                    bool(np.abs(tone).max() > LAST_WORD_PEAK)))
+    return out
+
+
+class FakeASR:
+    """Each tone burst is a word and each utterance a segment, wherever the
+    decoding starts and whatever silence was cut out before it (the VAD keeps
+    the bursts, padded, and drops the longer silences). `rtf` seconds of
+    simulated decoding per second of audio."""
+    name = "fake"
+
+    def __init__(self, rtf=0.0):
+        self.rtf = rtf
+
+    def load(self, settings, cpu_threads=8, num_workers=1):
+        pass
+
+    def speech_timestamps(self, audio, vad_parameters):
+        params = {**FAKE_VAD, **(vad_parameters or {})}
+        silence = params["min_silence_duration_ms"] / 1000
+        pad = int(params["speech_pad_ms"] / 1000 * SAMPLE_RATE)
+        chunks = []
+        for start, end, _, _ in bursts(audio):
+            if chunks and start - chunks[-1][1] < silence:
+                chunks[-1][1] = end
+            else:
+                chunks.append([start, end])
+        chunks = [[int(s * SAMPLE_RATE), int(e * SAMPLE_RATE)] for s, e in chunks]
+        # padded as Silero does: a silence shorter than two pads is split in half
+        for prev, nxt in zip(chunks, chunks[1:]):
+            gap_pad = min(pad, (nxt[0] - prev[1]) // 2)
+            prev[1] += gap_pad
+            nxt[0] -= gap_pad
+        if chunks:
+            chunks[0][0] = max(chunks[0][0] - pad, 0)
+            chunks[-1][1] = min(chunks[-1][1] + pad, len(audio))
+        return [{"start": s, "end": e} for s, e in chunks]
+
+    def transcribe(self, audio, settings, cpu_threads=8, initial_prompt=None, speech_chunks=None):
+        words = bursts(audio)
+        if speech_chunks is not None:
+            # as the batched pipeline: only the bursts whose middle is in a speech region
+            regions = [(c["start"] / SAMPLE_RATE, c["end"] / SAMPLE_RATE) for c in speech_chunks]
+            words = [w for w in words if any(s <= (w[0] + w[1]) / 2 < e for s, e in regions)]
+
+        groups = [[]]
+        for w in words:
+            groups[-1].append(w)
+            if w[3]:
+                groups.append([])
+        groups = [g for g in groups if g]
+
+        done = 0.0
+        for group in groups:
+            start, end = group[0][0], group[-1][1]
+            time.sleep(self.rtf * (end - done))
+            done = end
+            seg = {"start": start, "end": end, "text": " " + " ".join(w[2] for w in group),
+                   "avg_logprob": -0.2, "no_speech_prob": 0.01, "compression_ratio": 1.2}
+            if settings.get("word_timestamps"):
+                seg["words"] = [{"word": " " + w, "start": s, "end": e, "probability": 0.9} for s, e, w, _ in group]
+            yield seg
+
+
+class FakeAligner:
+    """Words spread over their segment in proportion to their length, one
+    phone per letter; `rtf` seconds of simulated alignment per second of
+    audio. The output has the shape of whisperx.align."""
+    name = "fake"
+
+    def __init__(self, rtf=0.0):
+        self.rtf = rtf
+
+    def load(self):
+        pass
+
+    def align_segment(self, seg) -> dict:
+        tokens = seg["text"].split()
+        start, end = float(seg["start"]), float(seg["end"])
+        total = sum(len(t) for t in tokens) or 1
+        t, words = start, []
+        for token in tokens:
+            dur = (end - start) * len(token) / total
+            letters = [ch for ch in token.lower() if ch.isalpha()] or [token[0]]
+            words.append({"word": token, "start": round(t, 3), "end": round(t + dur, 3), "score": 0.9,
+                          "phones": [{"phone": ch, "duration": dur / len(letters)} for ch in letters]})
+            t += dur
+        return {"start": start, "end": end, "text": seg["text"], "words": words}
+
+    def align(self, jobs):
+        out = {}
+        for ap, (_, segments) in jobs.items():
+            time.sleep(self.rtf * sum(float(s["end"]) - float(s["start"]) for s in segments))
+            out[ap] = [[self.align_segment(seg)] for seg in segments]
+        return out
+
+
+BACKENDS = {
+    "asr": {"faster-whisper": FasterWhisperASR, "fake": FakeASR},
+    "align": {"whisperx": WhisperXAligner, "fake": FakeAligner},
+}
+
+
+def get_backend(kind, spec):
+    """Backend of `kind` ("asr" / "align") from its spec: a name or {"name": ..., **options}."""
+    spec = {"name": spec} if isinstance(spec, str) else dict(spec)
+    name = spec.pop("name")
+    if name not in BACKENDS[kind]:
+        raise ValueError(f"backend {kind} sconosciuto: {name!r} (disponibili: {', '.join(BACKENDS[kind])})")
+    return BACKENDS[kind][name](**spec)
+
+
+# --------- SYNTHETIC AUDIO ---------
+def synth_audio(seconds, seed=0):
+    """Deterministic float32 audio: utterances of 3-12 tone bursts ("words")
+    with short gaps, separated by longer pauses; the last word of each
+    utterance is louder."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    t = rng.uniform(0.3, 1.0)
+    while t < seconds:
+        n_words = rng.integers(3, 13)
+        for i in range(n_words):
+            dur = rng.uniform(0.15, 0.6)
+            a, b = int(t * SAMPLE_RATE), min(int((t + dur) * SAMPLE_RATE), len(audio))
+            if a >= b:
+                break
+            freq = word_frequency(rng.integers(len(VOCABULARY)))
+            tone = np.sin(2 * np.pi * freq * np.arange(b - a) / SAMPLE_RATE)
+            audio[a:b] = (0.5 if i == n_words - 1 else 0.3) * tone * np.hanning(b - a)
+            t += dur + rng.uniform(0.05, 0.15)
+        t += rng.uniform(0.6, 1.5)
+    return audio
+
+
+def write_synthetic(path: Path, seconds, seed=0):
+    """16 kHz mono WAV of synth_audio, with its samples also put in the audio
+    cache, so load_audio never needs a decoder for it."""
+    import numpy as np
+
+    audio = synth_audio(seconds, seed)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+    pcm = cached_pcm_path(path)
+    if not pcm.exists():
+        pcm.parent.mkdir(parents=True, exist_ok=True)
+        tmp = pcm.with_name(f"{pcm.name}.{os.getpid()}.tmp")
+        audio.tofile(tmp)
+        os.replace(tmp, pcm)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic recordings for the fake backends.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_synth = sub.add_parser("synth", help="Write synthetic WAV files (and fill the audio cache).")
+    p_synth.add_argument("out_dir", type=Path)
+    p_synth.add_argument("--files", type=int, default=4)
+    p_synth.add_argument("--seconds", type=float, nargs="+", default=[120.0],
+                         help="Duration of each file (cycled over the files).")
+    p_synth.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(args.files):
+        seconds = args.seconds[i % len(args.seconds)]
+        path = args.out_dir / f"synth_{i:03d}.wav"
+        write_synthetic(path, seconds, seed=args.seed + i)
+        print(f"{path} ({seconds:.0f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#------------------------------------------
+# batched_align.py
+#------------------------------------------
+# Batched forced alignment with the WhisperX wav2vec2 align model.
+# whisperx.align runs one forward pass per segment, file by file. Here the
+# segments of several files (or of one long file) are sorted by length and
+# cut into buckets of similar duration, so each forward pass takes a whole
+# batch with little padding; the emissions are then aligned segment by
+# segment (CTC trellis + backtrack, as in whisperx) and the words are
+# scattered back to the file they came from.
+#
+# The output has the whisperx.align shape ({"segments": [... "words": [{"word",
+# "start", "end", "score"}]], "word_segments": [...]}), one output segment per
+# input segment (whisperx also splits segments into sentences).
+#
+# The emissions come from a backend function (emissions_torch by default):
+#   emissions_fn(model, meta, waveforms, device) -> [log-probs (frames x vocab)]
+
+import numpy as np
+
+from audio_cache import SAMPLE_RATE
+
+# whisperx pads shorter segments to this many samples (the conv front-end needs it)
+MIN_SAMPLES = 400
+
+
+def blank_id(dictionary) -> int:
+    for char, code in dictionary.items():
+        if char in ("[pad]", "<pad>"):
+            return code
+    return 0
+
+
+def prepare(seg, dictionary):
+    """
+    Characters of the segment text that the align model knows (lowercase,
+    spaces as "|"), with their index in the original text; None if there is
+    nothing to align.
+    """
+    text = seg["text"]
+    lead = len(text) - len(text.lstrip())
+    trail = len(text) - len(text.rstrip())
+    chars, char_idx = [], []
+    for i, ch in enumerate(text):
+        if i < lead or i > len(text) - trail - 1:
+            continue
+        ch = ch.lower().replace(" ", "|")
+        if ch in dictionary:
+            chars.append(ch)
+            char_idx.append(i)
+    if not chars:
+        return None
+    return {"chars": "".join(chars), "char_idx": char_idx, "tokens": [dictionary[c] for c in chars]}
+
+
+def get_trellis(emission, tokens, blank):
+    num_frame, num_tokens = emission.shape[0], len(tokens)
+    trellis = np.empty((num_frame + 1, num_tokens + 1), dtype=np.float32)
+    trellis[0, 0] = 0
+    trellis[1:, 0] = np.cumsum(emission[:, blank])
+    trellis[0, -num_tokens:] = -np.inf
+    trellis[-num_tokens:, 0] = np.inf
+    token_emission = emission[:, tokens]
+    for t in range(num_frame):
+        trellis[t + 1, 1:] = np.maximum(trellis[t, 1:] + emission[t, blank],
+                                        trellis[t, :-1] + token_emission[t])
+    return trellis
+
+
+def backtrack(trellis, emission, tokens, blank):
+    """Best path as [(token index, frame, prob)], or None if the text does not fit."""
+    j = trellis.shape[1] - 1
+    t_start = int(np.argmax(trellis[:, j]))
+    path = []
+    for t in range(t_start, 0, -1):
+        stayed = trellis[t - 1, j] + emission[t - 1, blank]
+        changed = trellis[t - 1, j - 1] + emission[t - 1, tokens[j - 1]]
+        prob = float(np.exp(emission[t - 1, tokens[j - 1] if changed > stayed else blank]))
+        path.append((j - 1, t - 1, prob))
+        if changed > stayed:
+            j -= 1
+            if j == 0:
+                break
+    else:
+        return None
+    return path[::-1]
+
+
+def merge_repeats(path):
+    """[(token index, first frame, last frame + 1, mean prob)] per character."""
+    merged = []
+    i1 = 0
+    while i1 < len(path):
+        i2 = i1
+        while i2 < len(path) and path[i2][0] == path[i1][0]:
+            i2 += 1
+        score = sum(p[2] for p in path[i1:i2]) / (i2 - i1)
+        merged.append((path[i1][0], path[i1][1], path[i2 - 1][1] + 1, score))
+        i1 = i2
+    return merged
+
+
+def align_segment(seg, prep, emission, blank):
+    """Word timings of one segment from its emission; words [] if alignment fails."""
+    t1, t2 = seg["start"], seg["end"]
+    out = {"start": t1, "end": t2, "text": seg["text"], "words": []}
+    if prep is None or len(prep["tokens"]) > emission.shape[0]:
+        return out
+    trellis = get_trellis(emission, prep["tokens"], blank)
+    path = backtrack(trellis, emission, prep["tokens"], blank)
+    if path is None:
+        return out
+    ratio = (t2 - t1) / (trellis.shape[0] - 1)  # seconds per frame
+
+    # characters -> words (split on the spaces of the original text)
+    text = seg["text"]
+    timed = {prep["char_idx"][tok]: (start, end, score) for tok, start, end, score in merge_repeats(path)}
+    words, current = [], None
+    for i, ch in enumerate(text):
+        if current is None:
+            current = {"chars": [], "starts": [], "ends": [], "scores": []}
+        current["chars"].append(ch)
+        if i in timed and ch != " ":
+            start, end, score = timed[i]
+            current["starts"].append(round(start * ratio + t1, 3))
+            current["ends"].append(round(end * ratio + t1, 3))
+            current["scores"].append(score)
+        if i == len(text) - 1 or text[i + 1] == " ":
+            words.append(current)
+            current = None
+
+    for w in words:
+        word = "".join(w["chars"]).strip()
+        if not word:
+            continue
+        if w["starts"]:
+            out["words"].append({"word": word, "start": min(w["starts"]), "end": max(w["ends"]),
+                                 "score": round(sum(w["scores"]) / len(w["scores"]), 3)})
+        else:
+            out["words"].append({"word": word})  # nothing alignable (digits, symbols)
+    timed_words = [w for w in out["words"] if "start" in w]
+    if timed_words:
+        out["start"], out["end"] = timed_words[0]["start"], timed_words[-1]["end"]
+    return out
+
+
+def emissions_torch(model, meta, waveforms, device):
+    """One padded forward pass of the torch align model for a list of waveforms."""
+    import torch
+
+    lengths = torch.tensor([len(w) for w in waveforms])
+    batch = torch.zeros((len(waveforms), int(lengths.max())))
+    for i, w in enumerate(waveforms):
+        batch[i, :len(w)] = torch.from_numpy(np.asarray(w, dtype=np.float32))
+    with torch.inference_mode():
+        if meta["type"] == "torchaudio":
+            logits, out_lengths = model(batch.to(device), lengths=lengths.to(device))
+        else:
+            mask = (torch.arange(batch.shape[1])[None, :] < lengths[:, None]).long()
+            logits = model(batch.to(device), attention_mask=mask.to(device)).logits
+            out_lengths = model._get_feat_extract_output_lengths(lengths)
+        log_probs = torch.log_softmax(logits, dim=-1).cpu().numpy()
+    return [log_probs[i, :int(n)] for i, n in enumerate(out_lengths.cpu())]
+
+
+def iter_buckets(items, batch_size):
+    """Indices of `items` (sample lengths) in batches of similar length."""
+    order = sorted(range(len(items)), key=lambda i: items[i])
+    for i in range(0, len(order), batch_size):
+        yield order[i:i + batch_size]
+
+
+def align_files(jobs, model, meta, device, batch_size=16, emissions_fn=emissions_torch):
+    """
+    jobs: {key: (audio, segments)} with audio as 16 kHz float32 samples.
+    Returns {key: aligned}, each in the whisperx.align shape.
+    """
+    dictionary = meta["dictionary"]
+    blank = blank_id(dictionary)
+
+    # flatten: one entry per segment that has something to align
+    entries = []  # (key, segment index, prep, waveform)
+    results = {}
+    for key, (audio, segments) in jobs.items():
+        results[key] = [None] * len(segments)
+        for i, seg in enumerate(segments):
+            prep = prepare(seg, dictionary)
+            f1, f2 = int(seg["start"] * SAMPLE_RATE), int(seg["end"] * SAMPLE_RATE)
+            if prep is None or f1 >= len(audio) or f2 <= f1:
+                results[key][i] = align_segment(seg, None, None, blank)
+                continue
+            wave = np.asarray(audio[f1:f2], dtype=np.float32)
+            if len(wave) < MIN_SAMPLES:
+                wave = np.pad(wave, (0, MIN_SAMPLES - len(wave)))
+            entries.append((key, i, prep, wave))
+
+    for bucket in iter_buckets([len(e[3]) for e in entries], batch_size):
+        emissions = emissions_fn(model, meta, [entries[b][3] for b in bucket], device)
+        for b, emission in zip(bucket, emissions):
+            key, i, prep, _ = entries[b]
+            results[key][i] = align_segment(jobs[key][1][i], prep, emission, blank)
+
+    return {key: {"segments": segs, "word_segments": [w for s in segs for w in s["words"]]}
+            for key, segs in results.items()}
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark cross-file batched alignment against per-file whisperx.align.
+
+The files are transcribed first (or taken from the transcription cache), so
+only alignment is measured. The reference is whisperx.align called once per
+file, as transcrive.py does by default; then all the segments of all the
+files are aligned together with batched_align for each batch size.
+
+For each run it reports wall time, segments per second, real-time factor
+(alignment time / audio duration) and how far the word boundaries move from
+the reference (mean and max over the words found in both).
+
+Usage:
+    python bench_align.py a.mp3 b.mp3 c.mp3
+    python bench_align.py *.mp3 --batch-sizes 8 16 32 --model medium
+"""
+
+import argparse
+import difflib
+import time
+from pathlib import Path
+
+from asr_models import get_align_model
+from audio_cache import SAMPLE_RATE, load_audio
+from batched_align import align_files
+from transcription import iter_transcription, transcription_settings
+
+
+def boundary_diff(reference, hypothesis):
+    """(mean, max) |start| and |end| difference over the matched timed words."""
+    ref = [w for w in reference["word_segments"] if "start" in w]
+    hyp = [w for w in hypothesis["word_segments"] if "start" in w]
+    matcher = difflib.SequenceMatcher(None, [w["word"] for w in ref], [w["word"] for w in hyp], autojunk=False)
+    diffs = []
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            r, h = ref[block.a + k], hyp[block.b + k]
+            diffs += [abs(r["start"] - h["start"]), abs(r["end"] - h["end"])]
+    if not diffs:
+        return 0.0, 0.0
+    return sum(diffs) / len(diffs), max(diffs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched vs per-file alignment benchmark.")
+    parser.add_argument("audio", type=Path, nargs="+", help="Audio files (already transcribed or not).")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--model", default="medium")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--language", default="it")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    import whisperx
+
+    settings = transcription_settings(args.model, args.compute_type, args.language)
+    jobs = {}
+    for path in args.audio:
+        jobs[path] = (load_audio(path), list(iter_transcription(path, settings, args.threads)))
+    n_segments = sum(len(segs) for _, segs in jobs.values())
+    duration = sum(len(audio) for audio, _ in jobs.values()) / SAMPLE_RATE
+
+    # model load is not part of the measure
+    model, meta, device = get_align_model(args.language)
+
+    print(f"\n{len(jobs)} file, {n_segments} segmenti, {duration:.1f}s di audio (align su {device})")
+    t0 = time.perf_counter()
+    reference = {p: whisperx.align(segs, model, meta, audio, device) for p, (audio, segs) in jobs.items()}
+    elapsed = time.perf_counter() - t0
+
+    print(f"\n{'Mode':<16} {'Time':>9} {'Seg/s':>8} {'RTF':>7} {'Speedup':>8} {'Mean diff':>10} {'Max diff':>9}")
+    print("-" * 72)
+    print(f"{'per-file':<16} {elapsed:8.1f}s {n_segments / elapsed:8.1f} {elapsed / duration:7.3f} "
+          f"{1.0:7.2f}x {'-':>10} {'-':>9}")
+    for batch_size in args.batch_sizes:
+        t0 = time.perf_counter()
+        aligned = align_files(jobs, model, meta, device, batch_size)
+        t = time.perf_counter() - t0
+        diffs = [boundary_diff(reference[p], aligned[p]) for p in jobs]
+        mean = sum(d[0] for d in diffs) / len(diffs)
+        worst = max(d[1] for d in diffs)
+        print(f"{f'batch={batch_size}':<16} {t:8.1f}s {n_segments / t:8.1f} {t / duration:7.3f} "
+              f"{elapsed / t:7.2f}x {mean * 1000:8.1f}ms {worst * 1000:7.0f}ms")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Peak memory of alignment against recording duration.
+
+A sample recording is transcribed once (or taken from the transcription
+cache), then tiled into synthetic recordings of the requested durations
+(audio and segments repeated back to back). Each recording is aligned in a
+fresh child process by the whisperx align backend (backends.WhisperXAligner)
+in each mode:
+
+    segments  one whisperx.align call per segment on the whole memory-mapped
+              waveform (what transcrive.py does by default)
+    windowed  every segment on its own window read from disk (ALIGN_WINDOWED)
+    whole     a single whisperx.align call with all the segments (--modes whole)
+
+The child reports its peak RSS, and the RSS after loading the align model as
+baseline. With windowed alignment the peak should stay flat as the duration
+grows.
+
+Usage:
+    python bench_align_memory.py sample.mp3
+    python bench_align_memory.py sample.mp3 --minutes 10 30 60 --stride 5 --modes segments windowed whole
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from audio_cache import SAMPLE_RATE, WindowedAudio, load_audio
+from transcription import iter_transcription, transcription_settings
+
+MODES = ("segments", "windowed", "whole")
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def child(pcm, segments_path, mode, language):
+    """Align one synthetic recording and print the memory measures as JSON."""
+    import numpy as np
+
+    from backends import get_backend
+    from windowed_align import WINDOW_PAD
+
+    with open(segments_path, "r", encoding="utf-8") as f:
+        segments = json.load(f)
+    aligner = get_backend("align", {"name": "whisperx", "language": language,
+                                    "window_pad": WINDOW_PAD if mode == "windowed" else None})
+    model, meta, device = aligner.load()
+    baseline = peak_rss_mb()
+
+    if mode == "windowed":
+        aligner.align({pcm: (WindowedAudio(pcm), segments)})
+    elif mode == "segments":
+        aligner.align({pcm: (np.memmap(pcm, dtype=np.float32, mode="c"), segments)})
+    else:
+        import whisperx
+        whisperx.align(segments, model, meta, np.memmap(pcm, dtype=np.float32, mode="c"), device)
+
+    print(json.dumps({"baseline": baseline, "peak": peak_rss_mb()}))
+
+
+def tile(audio, segments, seconds, out_dir):
+    """Repeat audio and segments up to `seconds`; return (pcm path, segments path, duration)."""
+    import numpy as np
+
+    unit = len(audio) / SAMPLE_RATE
+    reps = max(1, int(round(seconds / unit)))
+    pcm = out_dir / f"tiled_{seconds}.f32"
+    with open(pcm, "wb") as f:
+        for _ in range(reps):
+            np.asarray(audio, dtype=np.float32).tofile(f)
+    tiled = [{"start": s["start"] + r * unit, "end": s["end"] + r * unit, "text": s["text"]}
+             for r in range(reps) for s in segments]
+    seg_path = out_dir / f"tiled_{seconds}.json"
+    with open(seg_path, "w", encoding="utf-8") as f:
+        json.dump(tiled, f, ensure_ascii=False, default=float)
+    return pcm, seg_path, reps * unit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS of per-segment vs windowed alignment by duration.")
+    parser.add_argument("audio", type=Path, nargs="?", help="Sample recording to tile.")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[5, 15, 30, 60])
+    parser.add_argument("--stride", type=int, default=1, help="Align one segment every N (faster, same memory pattern).")
+    parser.add_argument("--modes", nargs="+", default=["segments", "windowed"], choices=MODES)
+    parser.add_argument("--model", default="medium")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--language", default="it")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--child", nargs=3, metavar=("PCM", "SEGMENTS", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.child[2], args.language)
+        return
+    if args.audio is None:
+        parser.error("the sample recording is required")
+
+    settings = transcription_settings(args.model, args.compute_type, args.language)
+    audio = load_audio(args.audio)
+    segments = list(iter_transcription(args.audio, settings, args.threads))
+
+    print(f"\n{'Duration':>9} {'Segments':>9} {'Mode':>9} {'Baseline':>10} {'Peak RSS':>10} {'Growth':>9}")
+    print("-" * 62)
+    with tempfile.TemporaryDirectory() as tmp:
+        for minutes in args.minutes:
+            pcm, seg_path, seconds = tile(audio, segments, minutes * 60, Path(tmp))
+            with open(seg_path, "r", encoding="utf-8") as f:
+                tiled = json.load(f)[::args.stride]
+            with open(seg_path, "w", encoding="utf-8") as f:
+                json.dump(tiled, f, ensure_ascii=False)
+            for mode in args.modes:
+                out = subprocess.run([sys.executable, __file__, "--language", args.language,
+                                      "--child", str(pcm), str(seg_path), mode],
+                                     capture_output=True, text=True, check=True)
+                mem = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"{seconds / 60:8.1f}m {len(tiled):>9} {mode:>9} {mem['baseline']:8.0f}MB "
+                      f"{mem['peak']:8.0f}MB {mem['peak'] - mem['baseline']:7.0f}MB")
+            pcm.unlink()
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark the batched VAD-chunk mode against the sequential path.
+
+The same audio is transcribed once sequentially (BATCH_SIZE = 0) and once per
+batch size, on the speech regions of vad_cache as the scripts do. For each run it reports wall time, real-time factor
+(RTF = processing time / audio duration, lower is faster) and how much the
+output differs from the sequential transcript: number of segments, word-level
+difference and changed txt lines.
+
+Usage:
+    python bench_batched.py clip.mp3
+    python bench_batched.py clip.mp3 --batch-sizes 4 8 16 --threads 8 --model medium
+"""
+
+import argparse
+import difflib
+import time
+from pathlib import Path
+
+import vad_cache
+from asr_models import get_asr_model, get_batched_pipeline
+from audio_cache import SAMPLE_RATE, load_audio
+from transcription import iter_segments, transcription_settings
+from transcrive_txt import format_timestamp
+
+
+def txt_lines(segments):
+    return [f"[{format_timestamp(s['start'])} - {format_timestamp(s['end'])}] {s['text'].strip()}" for s in segments]
+
+
+def word_diff_rate(reference, hypothesis) -> float:
+    """Share of reference words not matched in the hypothesis (0 = same text)."""
+    ref = " ".join(s["text"] for s in reference).lower().split()
+    hyp = " ".join(s["text"] for s in hypothesis).lower().split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    matched = sum(b.size for b in difflib.SequenceMatcher(None, ref, hyp, autojunk=False).get_matching_blocks())
+    return 1.0 - matched / len(ref)
+
+
+def run(audio_path, audio, settings, threads):
+    """Transcribe as transcription._transcribe does (speech regions from the VAD cache, VAD time included)."""
+    t0 = time.perf_counter()
+    speech_chunks = vad_cache.get_speech_chunks(audio_path, audio, settings["vad_parameters"],
+                                                batched=bool(settings["batch_size"]))
+    segments = list(iter_segments(audio, settings, threads, speech_chunks=speech_chunks))
+    return segments, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched vs sequential transcription benchmark.")
+    parser.add_argument("audio", type=Path, help="Audio file to transcribe.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--model", default="medium")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--language", default="it")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    audio = load_audio(args.audio)
+    duration = len(audio) / SAMPLE_RATE
+    settings = transcription_settings(args.model, args.compute_type, args.language)
+
+    # model load is not part of the measure
+    get_asr_model(args.model, args.threads, args.compute_type)
+    get_batched_pipeline(args.model, args.threads, args.compute_type)
+
+    print(f"\n{args.audio.name}: {duration:.1f}s di audio, modello {args.model} ({args.compute_type}, {args.threads} thread)")
+    reference, elapsed = run(args.audio, audio, settings, args.threads)
+    ref_lines = txt_lines(reference)
+
+    print(f"\n{'Mode':<16} {'Time':>9} {'RTF':>7} {'Speedup':>8} {'Segments':>9} {'Word diff':>10} {'Lines changed':>14}")
+    print("-" * 79)
+    print(f"{'sequential':<16} {elapsed:8.1f}s {elapsed / duration:7.3f} {1.0:7.2f}x {len(reference):>9} {'-':>10} {'-':>14}")
+    for batch_size in args.batch_sizes:
+        segments, t = run(args.audio, audio, {**settings, "batch_size": batch_size}, args.threads)
+        lines = txt_lines(segments)
+        changed = sum(1 for op in difflib.ndiff(ref_lines, lines) if op.startswith("+ "))
+        print(f"{f'batch={batch_size}':<16} {t:8.1f}s {t / duration:7.3f} {elapsed / t:7.2f}x "
+              f"{len(segments):>9} {word_diff_rate(reference, segments):9.1%} {changed:>14}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
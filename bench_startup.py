@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for transcrive.py and transcrive_txt.py.
+
+Measures, in a fresh Python process each time:
+  - time to exit on an empty AUDIO_DIR ("Nessun file audio"), which should not
+    import torch / faster_whisper / whisperx or load any model;
+  - time to first file processed, on a folder that holds only SAMPLE
+    (model load + transcription of that one file), with empty data caches
+    (decoded audio, VAD, transcriptions, alignments) in a temporary CACHE_DIR:
+    otherwise every run after the first would only read the cache. The
+    calibration profile and the ONNX export are still read from the real
+    CACHE_DIR, as they are settings, not results.
+
+Usage:
+    python bench_startup.py                       # empty-directory startup only
+    python bench_startup.py --sample clip.mp3     # + time to first file
+    python bench_startup.py --max-empty 1.5       # exit 1 if startup regresses
+"""
+
+import argparse
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPTS = ("transcrive_txt", "transcrive")
+REPO_DIR = Path(__file__).resolve().parent
+
+# Run main() of a script with AUDIO_DIR pointed at the given folder
+RUNNER = (
+    "import sys; from pathlib import Path; sys.path.insert(0, {repo!r});"
+    "import {module} as m; m.AUDIO_DIR = Path({audio_dir!r});"
+    "sys.exit(m.main())"
+)
+
+# The same, with the data caches under `cache_dir` (imported before the
+# script, so every module sees it)
+FRESH_CACHE_RUNNER = (
+    "import sys; from pathlib import Path; sys.path.insert(0, {repo!r});"
+    "import audio_cache; real = audio_cache.CACHE_DIR; audio_cache.CACHE_DIR = Path({cache_dir!r});"
+    "import asr_models, onnx_align; asr_models.PROFILE_PATH = real / asr_models.PROFILE_PATH.name;"
+    "onnx_align.ONNX_DIR = real / onnx_align.ONNX_DIR.name;"
+    "import {module} as m; m.AUDIO_DIR = Path({audio_dir!r});"
+    "sys.exit(m.main())"
+)
+
+
+def time_run(module: str, audio_dir: Path, cache_dir: Path = None) -> tuple[float, bool]:
+    """Wall-clock seconds of one run in a fresh interpreter, and whether it ran cleanly.
+    With cache_dir, the data caches of the run start empty there."""
+    if cache_dir is None:
+        code = RUNNER.format(repo=str(REPO_DIR), module=module, audio_dir=str(audio_dir))
+    else:
+        code = FRESH_CACHE_RUNNER.format(repo=str(REPO_DIR), module=module, audio_dir=str(audio_dir),
+                                         cache_dir=str(cache_dir))
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    elapsed = time.perf_counter() - t0
+    stderr = proc.stderr.decode("utf-8", "replace")
+    # "Nessun file ..." exits with a message, which is the expected outcome here
+    ok = proc.returncode == 0 or "Nessun file" in stderr
+    if not ok:
+        print(f"[ERR] {module}:\n{stderr}")
+    return elapsed, ok
+
+
+def report(label: str, times: list[float]) -> float:
+    med = statistics.median(times)
+    print(f"{label:<40} min {min(times):7.3f}s   median {med:7.3f}s   ({len(times)} run)")
+    return med
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup benchmark for the transcription scripts.")
+    parser.add_argument("--sample", type=Path, default=None, help="Short audio file for the time-to-first-file run.")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="Runs per measurement (default: 5).")
+    parser.add_argument("--max-empty", type=float, default=None,
+                        help="Fail (exit 1) if the median empty-directory startup exceeds this many seconds.")
+    args = parser.parse_args()
+
+    regressions = []
+    with tempfile.TemporaryDirectory() as tmp:
+        empty_dir = Path(tmp) / "empty"
+        empty_dir.mkdir()
+
+        print(f"\n{'Measure':<40} {'Time':>10}")
+        print("-" * 80)
+        for module in SCRIPTS:
+            runs = [time_run(module, empty_dir) for _ in range(args.repeat)]
+            med = report(f"{module}: exit on empty dir", [t for t, _ in runs])
+            if not all(ok for _, ok in runs):
+                regressions.append(f"{module}: the run failed")
+            elif args.max_empty is not None and med > args.max_empty:
+                regressions.append(f"{module}: {med:.3f}s > {args.max_empty:.3f}s")
+
+        if args.sample is not None:
+            for module in SCRIPTS:
+                times = []
+                for _ in range(args.repeat):
+                    # a fresh folder and fresh caches each time, so no output
+                    # or cached result from a previous run is reused
+                    run_dir = Path(tempfile.mkdtemp(dir=tmp))
+                    shutil.copy2(args.sample, run_dir / args.sample.name)
+                    times.append(time_run(module, run_dir, cache_dir=run_dir / "cache")[0])
+                report(f"{module}: first file processed", times)
+        print("-" * 80)
+
+    if regressions:
+        print("Startup regression:")
+        for r in regressions:
+            print(f"  {r}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
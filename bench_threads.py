@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Throughput of ASR + alignment under different splits of the thread budget.
+
+Each configuration starts `workers` processes; every worker transcribes the
+sample (faster-whisper, CTranslate2 threads) and aligns it (whisperx, torch
+threads), either one after the other or at the same time (--overlap, as with
+PIPELINE = True in transcrive.py). All workers start together once their
+models are loaded. For each worker count the budget split of
+asr_pool.plan_threads is compared with the other align shares and with the
+default setup (torch left at one thread per core next to CTranslate2).
+
+The aggregate RTF is wall time / audio processed (lower is better);
+throughput is audio seconds per second.
+
+Usage:
+    python bench_threads.py sample.mp3
+    python bench_threads.py sample.mp3 --budget 8 --workers 1 2 4 --align-shares 0.25 0.5 0.75 --overlap
+"""
+
+import argparse
+import os
+import threading
+from pathlib import Path
+
+from asr_pool import measure_rtf, plan_threads
+
+def _setup(sample, seconds, settings, ct2, torch_threads, overlap):
+    from asr_models import get_align_model, get_asr_model, set_torch_threads
+    from audio_cache import SAMPLE_RATE, load_audio
+    from transcription import iter_segments
+
+    if torch_threads is not None:
+        set_torch_threads(*torch_threads)
+    get_asr_model(settings["model_size"], ct2, settings["compute_type"])
+    get_align_model(settings["language"])
+    audio = load_audio(sample)[: int(seconds * SAMPLE_RATE)]
+    # segments to align, so the alignment does not wait for this worker's ASR
+    segments = list(iter_segments(audio, settings, ct2))
+    return {"audio": audio, "settings": settings, "ct2": ct2, "segments": segments, "overlap": overlap}
+
+
+def _asr_and_align(state):
+    import whisperx
+
+    from asr_models import get_align_model
+    from transcription import iter_segments
+
+    audio, settings = state["audio"], state["settings"]
+    model, meta, device = get_align_model(settings["language"])
+
+    def asr():
+        for _seg in iter_segments(audio, settings, state["ct2"]):
+            pass
+
+    def align():
+        whisperx.align(state["segments"], model, meta, audio, device)
+
+    if state["overlap"]:
+        t = threading.Thread(target=align)
+        t.start()
+        asr()
+        t.join()
+    else:
+        asr()
+        align()
+
+
+def measure(sample, seconds, settings, workers, ct2, torch_threads, overlap) -> float:
+    """Aggregate RTF of `workers` processes doing ASR + alignment of the sample at once."""
+    return measure_rtf(workers, seconds, _setup, (str(sample), seconds, settings, ct2, torch_threads, overlap),
+                       _asr_and_align)
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="ASR + alignment throughput under thread-budget splits.")
+    parser.add_argument("sample", type=Path, help="Representative audio file (only the first --seconds are used).")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--budget", type=int, default=cores, help="Total threads (CPU_THREADS).")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--align-shares", type=float, nargs="+", default=[0.25, 0.5, 0.75])
+    parser.add_argument("--overlap", action="store_true", help="ASR and alignment at the same time (PIPELINE).")
+    parser.add_argument("--model", default="medium")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--language", default="it")
+    args = parser.parse_args()
+
+    from audio_cache import SAMPLE_RATE, load_audio
+    from transcription import transcription_settings
+
+    seconds = min(args.seconds, len(load_audio(args.sample)) / SAMPLE_RATE)
+    settings = transcription_settings(args.model, args.compute_type, args.language)
+    mode = "insieme" if args.overlap else "in sequenza"
+    print(f"\n{args.sample.name} ({seconds:.0f}s), budget {args.budget} thread su {cores} core, ASR e allineamento {mode}")
+    print(f"\n{'Split':<12} {'Workers':>8} {'CT2':>5} {'Torch':>6} {'RTF':>8} {'Audio/s':>8}")
+    print("-" * 52)
+
+    for workers in args.workers:
+        configs = [("default", plan_threads(args.budget, workers)["ct2"], None)]
+        shares = args.align_shares if args.overlap else [None]
+        for share in shares:
+            plan = plan_threads(args.budget, workers, overlap=args.overlap, align_share=share or 0.5)
+            name = f"share={share}" if share is not None else "budget"
+            configs.append((name, plan["ct2"], (plan["torch_intra"], plan["torch_inter"])))
+        for name, ct2, torch_threads in configs:
+            torch_label = f"{torch_threads[0]}+{torch_threads[1]}" if torch_threads else f"{cores}*"
+            try:
+                rtf = measure(args.sample, seconds, settings, workers, ct2, torch_threads, args.overlap)
+            except Exception as e:
+                print(f"{name:<12} {workers:>8} {ct2:>5} {torch_label:>6} {'Error':>8}  ({e})")
+                continue
+            print(f"{name:<12} {workers:>8} {ct2:>5} {torch_label:>6} {rtf:8.3f} {1 / rtf:7.1f}x")
+    print("-" * 52)
+    print("* torch default: one thread per core in every worker\n")
+
+
+if __name__ == "__main__":
+    main()
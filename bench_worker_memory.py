@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Memory of the worker pool against the number of workers, for each way of
+sharing the model weights (WORKER_SHARING in transcrive.py):
+
+    none     spawned processes, each loads Whisper and the align model
+    fork     the align model is loaded once, workers are forked after it
+             (copy-on-write pages); Whisper is loaded in every worker
+    threads  one process, one Whisper model with one CTranslate2 worker per
+             thread, one align model
+
+Every configuration runs in a fresh process. Each worker loads the models,
+transcribes and aligns the first --seconds of the sample (so the memory of a
+real run is touched), then waits; with all workers waiting, the RSS and PSS
+of the whole group (parent + workers) are read from /proc. RSS counts shared
+pages once per process, PSS splits them among the processes: the PSS total
+is the real footprint and should grow far less than linearly when the
+weights are shared. "Growth" is the footprint relative to the first worker
+count of the same mode. PSS is Linux only (RSS elsewhere).
+
+Usage:
+    python bench_worker_memory.py sample.mp3
+    python bench_worker_memory.py sample.mp3 --workers 1 2 4 --modes none fork threads
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from asr_pool import memory_usage, plan_threads, pool_pids
+
+BARRIER_TIMEOUT = 1800  # seconds: a worker stuck in loading should not hang the benchmark
+_state = {}
+
+
+def _load(settings, ct2, torch_intra, num_workers=1):
+    from asr_models import get_align_model, get_asr_model, set_torch_threads
+
+    set_torch_threads(torch_intra)
+    get_asr_model(settings["model_size"], ct2, settings["compute_type"], num_workers)
+    get_align_model(settings["language"])
+
+
+def _init_worker(settings, ct2, torch_intra, done, measured):
+    _load(settings, ct2, torch_intra)
+    _state.update(done=done, measured=measured)
+
+
+def _work(job):
+    """Transcribe and align the sample, then keep the models until the group is measured."""
+    import whisperx
+
+    from asr_models import get_align_model
+    from audio_cache import SAMPLE_RATE, load_audio
+    from transcription import iter_segments
+
+    sample, seconds, settings, ct2 = job
+    try:
+        audio = load_audio(sample)[: int(seconds * SAMPLE_RATE)]
+        model, meta, device = get_align_model(settings["language"])
+        whisperx.align(list(iter_segments(audio, settings, ct2)), model, meta, audio, device)
+    except Exception:
+        _state["done"].abort()  # the parent stops waiting
+        raise
+    _state["done"].wait(BARRIER_TIMEOUT)
+    _state["measured"].wait(BARRIER_TIMEOUT)
+
+
+def _measure_group(done, measured, pending):
+    """Wait for every worker, read the group memory, let them go; `pending()` re-raises their errors."""
+    try:
+        done.wait(BARRIER_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pending()
+        raise
+    usage = memory_usage(pool_pids())
+    measured.wait(BARRIER_TIMEOUT)
+    pending()
+    return usage
+
+
+def _driver(mode, workers, job, plan, queue):
+    """One configuration, in its own process: puts the group memory (or the error) on `queue`."""
+    settings = job[2]
+    try:
+        if mode == "threads":
+            _load(settings, plan["ct2"], plan["torch_intra"], num_workers=workers)
+            done, measured = threading.Barrier(workers + 1), threading.Barrier(workers + 1)
+            _state.update(done=done, measured=measured)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_work, job) for _ in range(workers)]
+                usage = _measure_group(done, measured, lambda: [f.result() for f in futures])
+        else:
+            if mode == "fork":
+                from asr_models import get_align_model, set_torch_threads
+
+                set_torch_threads(1)  # no OpenMP pool in the parent before the fork
+                get_align_model(settings["language"])
+            ctx = mp.get_context("fork" if mode == "fork" else "spawn")
+            done, measured = ctx.Barrier(workers + 1), ctx.Barrier(workers + 1)
+            initargs = (settings, plan["ct2"], plan["torch_intra"], done, measured)
+            with ctx.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+                pending = pool.map_async(_work, [job] * workers, chunksize=1)
+                usage = _measure_group(done, measured, pending.get)
+        queue.put(usage)
+    except Exception as e:
+        queue.put({"error": str(e) or type(e).__name__})
+
+
+def measure(mode, workers, job, budget) -> dict:
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    driver = ctx.Process(target=_driver, args=(mode, workers, job, plan_threads(budget, workers), queue))
+    driver.start()
+    result = queue.get()
+    driver.join()
+    return result
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Worker pool memory (RSS / PSS) by weight-sharing mode.")
+    parser.add_argument("sample", type=Path, help="Representative audio file (only the first --seconds are used).")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", default=["none", "fork", "threads"],
+                        choices=["none", "fork", "threads"])
+    parser.add_argument("--budget", type=int, default=cores, help="Total threads (CPU_THREADS).")
+    parser.add_argument("--model", default="medium")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--language", default="it")
+    args = parser.parse_args()
+
+    from transcription import transcription_settings
+
+    settings = transcription_settings(args.model, args.compute_type, args.language)
+    print(f"\n{args.sample.name} ({args.seconds:.0f}s), modello {args.model} {args.compute_type}, "
+          f"budget {args.budget} thread")
+    print(f"\n{'Mode':<8} {'Workers':>8} {'Procs':>6} {'RSS':>9} {'PSS':>9} {'Growth':>7}")
+    print("-" * 52)
+
+    for mode in args.modes:
+        if mode == "fork" and sys.platform == "darwin":
+            print(f"{'fork':<8} {'':>8} {'':>6}  (not safe on macOS, skipped)")
+            continue
+        first = None
+        for workers in args.workers:
+            ct2 = plan_threads(args.budget, workers)["ct2"]
+            usage = measure(mode, workers, (str(args.sample), args.seconds, settings, ct2), args.budget)
+            if "error" in usage:
+                print(f"{mode:<8} {workers:>8} {'':>6} {'Error':>9}  ({usage['error']})")
+                continue
+            footprint = usage["pss"] if usage["pss"] is not None else usage["rss"]
+            first = first or (workers, footprint)
+            pss = f"{usage['pss'] / 2**30:8.2f}G" if usage["pss"] is not None else f"{'-':>9}"
+            growth = footprint / first[1]
+            print(f"{mode:<8} {workers:>8} {usage['processes']:>6} {usage['rss'] / 2**30:8.2f}G {pss} "
+                  f"{growth:6.2f}x")
+    print("-" * 52)
+    print("Growth: PSS (RSS without /proc) relative to the first worker count of the same mode;")
+    print("without sharing it grows about as fast as the number of workers.\n")
+
+
+if __name__ == "__main__":
+    main()
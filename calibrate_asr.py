@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Calibrate faster-whisper on this machine.
+
+Transcribes a short sample under a grid of compute types, thread counts and
+worker counts, and measures the real-time factor (RTF = processing time /
+audio duration; for several workers it is the aggregate one, so lower always
+means more audio per second). The fastest configuration is saved to the local
+profile file (PROFILE_PATH), which transcrive.py and transcrive_txt.py load
+automatically (USE_CALIBRATION = True).
+
+Usage:
+    python calibrate_asr.py sample.mp3
+    python calibrate_asr.py sample.mp3 --seconds 60 --compute-types int8 float32 --threads 4 8 16 --workers 1 2 4
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from asr_models import PROFILE_PATH
+from asr_pool import measure_rtf
+
+def _setup(sample, seconds, settings, threads):
+    from asr_models import get_asr_model
+    from audio_cache import SAMPLE_RATE, load_audio
+
+    get_asr_model(settings["model_size"], threads, settings["compute_type"])
+    return {"audio": load_audio(sample)[: int(seconds * SAMPLE_RATE)], "settings": settings, "threads": threads}
+
+
+def _transcribe(state):
+    from transcription import iter_segments
+
+    for _seg in iter_segments(state["audio"], state["settings"], state["threads"]):
+        pass
+
+
+def measure(sample, seconds, settings, threads, workers) -> float:
+    """Aggregate RTF of `workers` processes transcribing the sample at once."""
+    return measure_rtf(workers, seconds, _setup, (str(sample), seconds, settings, threads), _transcribe)
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Auto-tune compute type, threads and workers for faster-whisper.")
+    parser.add_argument("sample", type=Path, help="Representative audio file (only the first --seconds are used).")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--model", default="medium")
+    parser.add_argument("--language", default="it")
+    parser.add_argument("--compute-types", nargs="+", default=["int8", "int8_float32", "float32"])
+    parser.add_argument("--threads", type=int, nargs="+", default=sorted({2, 4, 8, cores}),
+                        help="Threads per worker to try.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--dry-run", action="store_true", help="Measure only, do not write the profile.")
+    args = parser.parse_args()
+
+    from audio_cache import SAMPLE_RATE, load_audio
+    from transcription import transcription_settings
+
+    seconds = min(args.seconds, len(load_audio(args.sample)) / SAMPLE_RATE)
+    print(f"\nCalibrating {args.model} on {args.sample.name} ({seconds:.0f}s), {cores} core")
+    print(f"\n{'Compute type':<14} {'Threads':>8} {'Workers':>8} {'RTF':>8}")
+    print("-" * 42)
+
+    results = []
+    for compute_type in args.compute_types:
+        settings = transcription_settings(args.model, compute_type, args.language)
+        for workers in args.workers:
+            for threads in args.threads:
+                if threads * workers > cores:
+                    continue  # oversubscribed: never faster
+                try:
+                    rtf = measure(args.sample, seconds, settings, threads, workers)
+                except Exception as e:
+                    print(f"{compute_type:<14} {threads:>8} {workers:>8} {'Error':>8}  ({e})")
+                    continue
+                results.append({"compute_type": compute_type, "threads": threads, "workers": workers, "rtf": rtf})
+                print(f"{compute_type:<14} {threads:>8} {workers:>8} {rtf:8.3f}")
+    print("-" * 42)
+
+    if not results:
+        raise SystemExit("No configuration could be measured.")
+
+    best = min(results, key=lambda r: r["rtf"])
+    print(f"Best: {best['compute_type']}, {best['workers']} worker x {best['threads']} thread (RTF {best['rtf']:.3f})")
+    if args.dry_run:
+        return
+
+    profile = {}
+    if PROFILE_PATH.exists():
+        with open(PROFILE_PATH, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    profile[args.model] = {
+        "compute_type": best["compute_type"],
+        "cpu_threads": best["threads"] * best["workers"],  # total budget, as CPU_THREADS in the scripts
+        "workers": best["workers"],
+        "rtf": round(best["rtf"], 4),
+        "cpu_count": cores,
+        "sample_seconds": seconds,
+        "calibrated": datetime.now().isoformat(timespec="seconds"),
+    }
+    PROFILE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(PROFILE_PATH, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    print(f"\n✅ Profile saved to: {PROFILE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
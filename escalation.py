@@ -0,0 +1,85 @@
+#------------------------------------------
+# escalation.py
+#------------------------------------------
+# Confidence-driven escalation to a larger model.
+# Everything is transcribed with the fast model; only the segments whose
+# confidence crosses the thresholds (low avg_logprob, high no_speech_prob or
+# high compression ratio, the same signals faster-whisper uses for its
+# temperature fallback) are decoded again with the larger model, on their own
+# stretch of audio, and spliced back in place of the original text.
+#
+# settings["escalation"] = {"model_size": "large-v3", "avg_logprob": -0.7,
+#                           "no_speech_prob": 0.6, "compression_ratio": 2.4}
+
+from pathlib import Path
+
+from audio_cache import SAMPLE_RATE
+
+MIN_CLIP_SECONDS = 0.1
+
+
+def is_weak(seg, thresholds) -> bool:
+    """True if any confidence measure of the segment crosses its threshold."""
+    return (seg.get("avg_logprob", 0.0) < thresholds["avg_logprob"]
+            or seg.get("no_speech_prob", 0.0) > thresholds["no_speech_prob"]
+            or seg.get("compression_ratio", 0.0) > thresholds["compression_ratio"])
+
+
+def redecode_settings(settings) -> dict:
+    """The settings of the larger model: one segment on its own, sequential, no VAD."""
+    return {**settings, "model_size": settings["escalation"]["model_size"], "vad_filter": False, "batch_size": 0,
+            "condition_on_previous_text": False, "without_timestamps": not settings.get("word_timestamps")}
+
+
+def redecode(seg, audio, backend, settings, cpu_threads=8):
+    """
+    Transcribe the audio of one segment again with the ASR `backend` and the
+    redecode_settings `settings`.
+    Returns (text, avg_logprob, words), or None if nothing was decoded; words
+    (shifted onto the recording's timeline) is None without word_timestamps.
+    """
+    clip = audio[int(seg["start"] * SAMPLE_RATE):int(seg["end"] * SAMPLE_RATE)]
+    if len(clip) < MIN_CLIP_SECONDS * SAMPLE_RATE:
+        return None
+    parts = list(backend.transcribe(clip, settings, cpu_threads))
+    if not parts:
+        return None
+    text = "".join(p["text"] for p in parts)
+    avg_logprob = sum(p["avg_logprob"] for p in parts) / len(parts)
+    words = None
+    if settings.get("word_timestamps"):
+        words = [{**w, "start": seg["start"] + w["start"], "end": seg["start"] + w["end"]}
+                 for p in parts for w in (p.get("words") or [])]
+    return text, avg_logprob, words
+
+
+def iter_escalated(segments, audio, settings, cpu_threads=8, name=""):
+    """
+    Pass the segments through, re-decoding the weak ones with the larger model.
+    The new text is kept only if the larger model is more confident; the
+    timestamps of the fast model are kept, so the output format is unchanged.
+    """
+    from transcription import asr_backend
+
+    escalation = settings["escalation"]
+    larger = redecode_settings(settings)
+    backend = asr_backend(larger)
+    n_total = n_weak = n_replaced = 0
+
+    for seg in segments:
+        n_total += 1
+        if is_weak(seg, escalation):
+            n_weak += 1
+            # the backend loads the larger model on the first weak segment
+            result = redecode(seg, audio, backend, larger, cpu_threads)
+            if result is not None and result[1] > seg.get("avg_logprob", float("-inf")):
+                text, avg_logprob, words = result
+                seg = {**seg, "text": text, "avg_logprob": avg_logprob, "escalated": escalation["model_size"]}
+                if words is not None:
+                    seg["words"] = words
+                n_replaced += 1
+        yield seg
+
+    if n_weak:
+        print(f"[ESCALATION] {Path(name).name}: {n_weak}/{n_total} segmenti ridecodificati con "
+              f"{escalation['model_size']} ({n_replaced} sostituiti)")
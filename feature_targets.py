@@ -0,0 +1,100 @@
+#------------------------------------------
+# feature_targets.py
+#------------------------------------------
+# Targeted alignment: the Scripts_JR detectors are run on the ASR text of
+# each segment, and only the segments with at least one candidate token go
+# to forced alignment. The detectors are imported from their own files (the
+# names start with "01_", so through importlib), and each one is called the
+# way its script calls it: on the text of a line for the txt scripts, on each
+# word (and each pair of adjacent words) for the word-level JSON scripts.
+
+import importlib.util
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent / "Scripts_JR"
+
+_modules = {}
+
+
+def _text(fn_name):
+    """Detector called on a whole line of text."""
+    return lambda m, text: len(getattr(m, fn_name)(text))
+
+
+def _words(fn_name, boundary=None):
+    """Detector called on every word, plus `boundary` on adjacent pairs."""
+    def count(m, text):
+        words = text.split()
+        hits = sum(len(getattr(m, fn_name)(w)) for w in words)
+        if boundary is not None:
+            hits += sum(1 for w1, w2 in zip(words, words[1:]) if getattr(m, boundary)(w1, w2))
+        return hits
+    return count
+
+
+def _rf(m, text):
+    return len(m.find_rf_candidates([("", "", text)], m.TRIGGER_WORDS, ""))
+
+
+# name -> (script file, hit counter)
+DETECTORS = {
+    "affrication_s": ("01_find_affrication_s_in_txt.py", _text("find_s_clusters")),
+    "diphthongs": ("01_find_diphtongs_in_txt.py", _text("find_diphtongs")),
+    "graphic_i": ("01_find_graphic_i_in_txt.py", _text("find_i_grafica")),
+    "intervocalic_bg": ("01_find_intervocalic_bg_in_txt.py", _text("find_intervocalic_bg")),
+    "intervocalic_s": ("01_find_intervocalic_s_in_txt.py", _text("find_intervocalic_s")),
+    "mente": ("01_find_mente_in_txt.py", _text("find_mente_in_txt")),
+    "syntactic_gemination": ("01_find_syntactic_gemination_in_txt.py", _rf),
+    "liquid_consonant": ("01_find_liquid_consonant_in_txt.py",
+                         _words("find_within_word_matches", "check_word_boundary")),
+    "nasal_voiceless_stops": ("01_find_nasal_voiceless_stops_in_txt.py",
+                              _words("find_within_word_matches", "check_word_boundary")),
+    "palatal_fricative": ("01_find_palatal_fricative_in_txt.py", _words("find_soft_c_positions")),
+    "s_palatalization": ("01_find_s_palatalization_in_txt.py", _words("find_s_palatalization_positions")),
+}
+
+
+def resolve(targets):
+    """Detector names from a set of names, or "all"; ValueError on unknown names."""
+    if targets == "all":
+        return sorted(DETECTORS)
+    unknown = set(targets) - set(DETECTORS)
+    if unknown:
+        raise ValueError(f"detector sconosciuti: {sorted(unknown)} (disponibili: {', '.join(sorted(DETECTORS))})")
+    return sorted(targets)
+
+
+def load_detector(name):
+    """The detector script as a module (imported once)."""
+    if name not in _modules:
+        script = SCRIPTS_DIR / DETECTORS[name][0]
+        spec = importlib.util.spec_from_file_location(f"jr_{name}", script)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[name] = module
+    return _modules[name]
+
+
+def count_hits(text, targets):
+    """{detector: number of candidates} in `text`, only detectors with hits."""
+    hits = {}
+    for name in targets:
+        n = DETECTORS[name][1](load_detector(name), text)
+        if n:
+            hits[name] = n
+    return hits
+
+
+def select_segments(segments, targets, name=""):
+    """
+    The segments with at least one candidate, each with a "features" entry
+    ({detector: hits}) that ends up in the JSON next to its words.
+    """
+    targets = resolve(targets)
+    selected = []
+    for seg in segments:
+        hits = count_hits(seg["text"], targets)
+        if hits:
+            selected.append({**seg, "features": hits})
+    print(f"[TARGET] {Path(name).name}: {len(selected)}/{len(segments)} segmenti con candidati")
+    return selected
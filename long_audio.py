@@ -0,0 +1,102 @@
+#------------------------------------------
+# long_audio.py
+#------------------------------------------
+# Intra-file parallelism for long recordings.
+# A recording is cut at VAD silences into pieces of about CHUNK_SECONDS; the
+# pieces are transcribed by separate worker processes (each with its own model
+# and its share of the threads) and stitched back in order, with each
+# segment's timestamps shifted by the start of its piece.
+#
+# The cut points depend only on the speech regions and on the target length,
+# so the output is the same whatever the number of workers (with one worker
+# the pieces are simply transcribed one after another in this process).
+
+import atexit
+import multiprocessing as mp
+
+from asr_pool import split_threads
+from audio_cache import SAMPLE_RATE, load_audio
+
+_pool = {"key": None, "pool": None}
+
+
+def plan_pieces(total_samples, speech_chunks, target_seconds, offset_samples=0):
+    """
+    Pieces [{"start", "end", "speech"}] (samples) covering the audio from
+    offset_samples to the end. A cut is made in the middle of the first
+    silence after a piece has reached target_seconds; "speech" holds the
+    speech regions of the piece relative to its start (None without VAD).
+    """
+    if speech_chunks is None:
+        return [{"start": offset_samples, "end": total_samples, "speech": None}]
+
+    target = int(target_seconds * SAMPLE_RATE)
+    cuts = [0]
+    for cur, nxt in zip(speech_chunks, speech_chunks[1:]):
+        if cur["end"] - cuts[-1] >= target:
+            cuts.append((cur["end"] + nxt["start"]) // 2)
+    cuts.append(total_samples)
+
+    pieces = []
+    for start, end in zip(cuts, cuts[1:]):
+        if end <= offset_samples:
+            continue  # already transcribed before the interruption
+        start = max(start, offset_samples)
+        speech = [{"start": max(c["start"], start) - start, "end": min(c["end"], end) - start}
+                  for c in speech_chunks if c["end"] > start and c["start"] < end]
+        pieces.append({"start": start, "end": end, "speech": speech})
+    return pieces
+
+
+def _transcribe_piece(job):
+    """Worker side: transcribe one piece of a file (read from the audio cache)."""
+    from transcription import iter_segments
+
+    audio_path, piece, settings, threads, prompt = job
+    audio = load_audio(audio_path)[piece["start"]:piece["end"]]
+    return list(iter_segments(audio, settings, threads, offset=piece["start"] / SAMPLE_RATE,
+                              initial_prompt=prompt, speech_chunks=piece["speech"]))
+
+
+def _init_worker(settings, threads):
+    from transcription import asr_backend
+    asr_backend(settings).load(settings, threads)
+
+
+def _get_pool(workers, threads, settings):
+    """One pool kept for the whole run, so each worker loads its model once."""
+    key = (workers, threads, settings["model_size"], settings["compute_type"])
+    if _pool["key"] != key:
+        if _pool["pool"] is not None:
+            _pool["pool"].terminate()
+        ctx = mp.get_context("spawn")
+        _pool["pool"] = ctx.Pool(workers, initializer=_init_worker, initargs=(settings, threads))
+        _pool["key"] = key
+    return _pool["pool"]
+
+
+@atexit.register
+def _close_pool():
+    if _pool["pool"] is not None:
+        _pool["pool"].terminate()
+
+
+def iter_pieces(audio_path, pieces, settings, cpu_threads=8, workers=1, initial_prompt=None):
+    """
+    Segments of all the pieces, in order. Only the first piece gets the
+    initial prompt (used on resume): every piece starts with a fresh context,
+    in parallel or not, so the result does not depend on `workers`.
+    """
+    jobs = [(str(audio_path), piece, settings, cpu_threads, initial_prompt if i == 0 else None)
+            for i, piece in enumerate(pieces)]
+
+    if workers <= 1 or len(pieces) <= 1:
+        for job in jobs:
+            yield from _transcribe_piece(job)
+        return
+
+    threads = split_threads(cpu_threads, workers)
+    jobs = [(path, piece, settings, threads, prompt) for path, piece, settings, _, prompt in jobs]
+    # imap keeps the order: piece i is yielded as soon as it and all before it are done
+    for segments in _get_pool(workers, threads, settings).imap(_transcribe_piece, jobs, chunksize=1):
+        yield from segments
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+ONNX Runtime backend for the wav2vec2 alignment model.
+
+The torch align model of whisperx.load_align_model is exported once to ONNX
+(optionally int8-quantized with onnxruntime's dynamic quantization) under
+CACHE_DIR/onnx/, next to a JSON with its metadata (character dictionary), so
+alignment no longer needs torch at run time. The emissions feed the same CTC
+alignment as batched_align (emissions_onnx is a drop-in emissions backend).
+The exported graph takes one unpadded waveform at a time (no attention mask),
+so each segment runs on its own.
+
+    python onnx_align.py export --language it [--int8]
+    python onnx_align.py validate sample.mp3 [--int8] [--tolerance 0.02]
+
+`validate` aligns the sample's segments with the torch model and with the
+ONNX model, checks that every word boundary is within --tolerance seconds
+(exit status 1 otherwise) and compares the CPU time of both.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from audio_cache import CACHE_DIR, SAMPLE_RATE
+
+ONNX_DIR = CACHE_DIR / "onnx"
+OPSET = 17
+
+
+def onnx_path(language, quantized=False) -> Path:
+    return ONNX_DIR / f"align_{language}{'_int8' if quantized else ''}.onnx"
+
+
+def meta_path(language) -> Path:
+    return ONNX_DIR / f"align_{language}.json"
+
+
+def _tmp_path(path: Path) -> Path:
+    """Temporary name of `path` unique to this process and thread, for an atomic os.replace."""
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def export(language, quantized=False) -> Path:
+    """
+    Export the torch align model of `language` (and quantize it); return the
+    .onnx path. Every file is written under a temporary name and renamed, the
+    metadata before the model: a model on disk always has its metadata, and
+    concurrent exports never see each other's half-written files.
+    transcrive.py exports once before starting its workers.
+    """
+    import torch
+
+    from asr_models import get_align_model
+
+    fp32 = onnx_path(language)
+    if not fp32.exists():
+        model, meta, _ = get_align_model(language)
+        model = model.to("cpu").eval()
+        hf = meta["type"] != "torchaudio"
+
+        class Emissions(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.model = model
+
+            def forward(self, waveform):
+                return self.model(waveform).logits if hf else self.model(waveform)[0]
+
+        ONNX_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_path(fp32)
+        torch.onnx.export(Emissions(), torch.zeros(1, SAMPLE_RATE), str(tmp), opset_version=OPSET,
+                          input_names=["waveform"], output_names=["logits"],
+                          dynamic_axes={"waveform": {0: "batch", 1: "samples"}, "logits": {0: "batch", 1: "frames"}})
+        meta_tmp = _tmp_path(meta_path(language))
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump({"language": meta["language"], "dictionary": meta["dictionary"], "type": meta["type"]},
+                      f, ensure_ascii=False)
+        os.replace(meta_tmp, meta_path(language))
+        os.replace(tmp, fp32)
+        print(f"[ONNX] esportato {fp32}")
+
+    if not quantized:
+        return fp32
+    int8 = onnx_path(language, quantized=True)
+    if not int8.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp = _tmp_path(int8)
+        quantize_dynamic(str(fp32), str(tmp), weight_type=QuantType.QInt8)
+        os.replace(tmp, int8)
+        print(f"[ONNX] quantizzato int8 {int8}")
+    return int8
+
+
+def load_meta(language) -> dict:
+    with open(meta_path(language), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def emissions_onnx(session, meta, waveforms, device=None):
+    """batched_align emissions backend: log-probs of each waveform from the ONNX session."""
+    out = []
+    for w in waveforms:
+        logits = session.run(None, {"waveform": np.asarray(w, dtype=np.float32)[None, :]})[0][0]
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        out.append(logits - np.log(np.exp(logits).sum(axis=-1, keepdims=True)))
+    return out
+
+
+# --------- VALIDATION ---------
+def boundary_diffs(reference, hypothesis):
+    """|start| and |end| differences of the timed words (same segments, same text)."""
+    diffs = []
+    for r_seg, h_seg in zip(reference["segments"], hypothesis["segments"]):
+        for r, h in zip(r_seg["words"], h_seg["words"]):
+            if "start" in r and "start" in h:
+                diffs += [abs(r["start"] - h["start"]), abs(r["end"] - h["end"])]
+    return diffs
+
+
+def validate(sample, language, quantized, tolerance, threads, model_size, compute_type) -> bool:
+    from asr_models import get_align_model, get_onnx_align_model, set_torch_threads
+    from audio_cache import load_audio
+    from batched_align import align_files, emissions_torch
+    from transcription import iter_transcription, transcription_settings
+
+    settings = transcription_settings(model_size, compute_type, language)
+    audio = load_audio(sample)
+    segments = list(iter_transcription(sample, settings, threads))
+    jobs = {sample: (audio, segments)}
+    duration = len(audio) / SAMPLE_RATE
+
+    set_torch_threads(threads)
+    model, meta, device = get_align_model(language)
+    session, onnx_meta = get_onnx_align_model(language, quantized, threads)
+
+    # one segment per forward pass in both, so only the backend differs
+    t0 = time.perf_counter()
+    reference = align_files(jobs, model, meta, device, batch_size=1, emissions_fn=emissions_torch)[sample]
+    t_torch = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    aligned = align_files(jobs, session, onnx_meta, None, batch_size=1, emissions_fn=emissions_onnx)[sample]
+    t_onnx = time.perf_counter() - t0
+
+    diffs = boundary_diffs(reference, aligned)
+    within = sum(1 for d in diffs if d <= tolerance)
+    label = "onnx-int8" if quantized else "onnx"
+    print(f"\n{sample.name}: {len(segments)} segmenti, {duration:.1f}s di audio, {threads} thread")
+    print(f"\n{'Backend':<10} {'Time':>8} {'RTF':>7} {'Speedup':>8}")
+    print("-" * 36)
+    print(f"{'torch':<10} {t_torch:7.1f}s {t_torch / duration:7.3f} {1.0:7.2f}x")
+    print(f"{label:<10} {t_onnx:7.1f}s {t_onnx / duration:7.3f} {t_torch / t_onnx:7.2f}x")
+    print("-" * 36)
+    if not diffs:
+        print("Nessun confine di parola da confrontare")
+        return True
+    print(f"Confini di parola: {within}/{len(diffs)} entro {tolerance * 1000:.0f}ms "
+          f"(media {sum(diffs) / len(diffs) * 1000:.1f}ms, max {max(diffs) * 1000:.0f}ms)")
+    return within == len(diffs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime backend for the alignment model.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_export = sub.add_parser("export", help="Export (and quantize) the align model.")
+    p_export.add_argument("--language", default="it")
+    p_export.add_argument("--int8", action="store_true", help="Also write the int8-quantized model.")
+    p_val = sub.add_parser("validate", help="Compare word boundaries and speed with the torch model.")
+    p_val.add_argument("sample", type=Path)
+    p_val.add_argument("--language", default="it")
+    p_val.add_argument("--int8", action="store_true")
+    p_val.add_argument("--tolerance", type=float, default=0.02, help="Max word-boundary difference (seconds).")
+    p_val.add_argument("--threads", type=int, default=8)
+    p_val.add_argument("--model", default="medium", help="ASR model for the sample's segments.")
+    p_val.add_argument("--compute-type", default="int8")
+    args = parser.parse_args()
+
+    if args.cmd == "export":
+        print(export(args.language, args.int8))
+        return
+    ok = validate(args.sample, args.language, args.int8, args.tolerance, args.threads, args.model, args.compute_type)
+    if not ok:
+        raise SystemExit(1)
+    print("✅ entro la tolleranza")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Re-align a hand-corrected transcript and rebuild its TextGrid / JSON.
+
+The corrected segments are read from the txt transcript
+([MM:SS.S - MM:SS.S] text, as written by the transcription scripts) or from a
+WhisperX JSON. Alignment goes through the per-segment cache
+(segment_align_cache): only the segments whose time or text changed are
+aligned again, the others are taken from the previous run. The outputs are
+written where transcrive.py puts them (OUTPUT_FORMATS, textgrid and json).
+
+Usage:
+    python realign.py JR_audio/a.mp3                       # reads JR_audio/transcriptions/a.txt
+    python realign.py JR_audio/a.mp3 --txt corrected/a.txt
+    python realign.py JR_audio/a.mp3 --json whisperx_output/a.json
+"""
+
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+import transcrive
+
+_line_re = re.compile(r"^\[(\d+):(\d+(?:\.\d+)?) - (\d+):(\d+(?:\.\d+)?)\] ?(.*)$")
+
+
+def read_txt_segments(path: Path):
+    """Segments of a [MM:SS.S - MM:SS.S] text transcript (other lines are skipped)."""
+    segments = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            m = _line_re.match(line.rstrip("\n"))
+            if m is None:
+                continue
+            m1, s1, m2, s2, text = m.groups()
+            segments.append({"start": int(m1) * 60 + float(s1), "end": int(m2) * 60 + float(s2), "text": text})
+    return segments
+
+
+def read_json_segments(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [{"start": float(s["start"]), "end": float(s["end"]), "text": s["text"]} for s in data.get("segments", [])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-align a corrected transcript (only the changed segments).")
+    parser.add_argument("audio", type=Path, help="Audio file of the transcript.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--txt", type=Path, help="Corrected txt transcript (default: transcriptions/<stem>.txt).")
+    source.add_argument("--json", type=Path, help="Corrected WhisperX JSON.")
+    args = parser.parse_args()
+
+    ap = args.audio
+    paths = transcrive.output_paths(ap)
+    if args.json is not None:
+        segments = read_json_segments(args.json)
+    else:
+        segments = read_txt_segments(args.txt or paths["txt"])
+    if not segments:
+        raise SystemExit("Nessun segmento da allineare")
+
+    t0 = time.perf_counter()
+    aligned = transcrive.align_by_segment({ap: (transcrive.align_audio(ap), segments)})[ap]
+    print(f"[ALIGN] {len(segments)} segmenti in {time.perf_counter() - t0:.1f}s")
+
+    if "textgrid" in transcrive.OUTPUT_FORMATS:
+        transcrive.to_textgrid(aligned, paths["textgrid"])
+        print(f"[TG] {paths['textgrid']}")
+    if "json" in transcrive.OUTPUT_FORMATS:
+        paths["json"].parent.mkdir(exist_ok=True)
+        transcrive.save_whisperx_json(aligned, paths["json"])
+        print(f"[JSON] {paths['json']}")
+
+
+if __name__ == "__main__":
+    main()
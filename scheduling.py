@@ -0,0 +1,67 @@
+#------------------------------------------
+# scheduling.py
+#------------------------------------------
+# Duration-aware scheduling for the transcription loops.
+# Durations are read up front from the file headers (mutagen, as in
+# mp3_duration.py), and files are dispatched longest first: a huge file
+# started last would otherwise leave a parallel run with a long tail on a
+# single worker. EtaTracker turns the observed real-time factor into a
+# running ETA over the audio seconds still to process.
+
+import time
+from pathlib import Path
+
+from audio_cache import cached_duration
+
+try:
+    import mutagen
+except ImportError:
+    mutagen = None
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    h, remainder = divmod(seconds, 3600)
+    m, s = divmod(remainder, 60)
+    if h:
+        return f"{h:02d}:{m:02d}:{s:02d}"
+    return f"{m:02d}:{s:02d}"
+
+
+def audio_duration(path: Path) -> float:
+    """Duration in seconds from the file header; 0.0 if it cannot be read."""
+    if mutagen is not None:
+        try:
+            audio = mutagen.File(path)
+            if audio is not None and audio.info is not None:
+                return float(audio.info.length)
+        except Exception:
+            pass
+    # no header information: a file already decoded in the cache still has its length
+    return cached_duration(path) or 0.0
+
+
+def longest_first(files):
+    """[(path, duration)] sorted by decreasing duration (ties by name)."""
+    durations = [(p, audio_duration(p)) for p in files]
+    return sorted(durations, key=lambda pd: (-pd[1], pd[0].name))
+
+
+class EtaTracker:
+    """Running ETA from the audio seconds processed so far and the wall time spent."""
+
+    def __init__(self, total_seconds: float):
+        self.total = total_seconds
+        self.done = 0.0
+        self.t0 = time.perf_counter()
+
+    def update(self, audio_seconds: float) -> str:
+        """Register a finished file and return the progress line to print."""
+        self.done += audio_seconds
+        elapsed = time.perf_counter() - self.t0
+        remaining = max(self.total - self.done, 0.0)
+        if self.done <= 0:
+            return f"ETA: n/d ({format_duration(remaining)} di audio rimanenti)"
+        rtf = elapsed / self.done
+        return (f"ETA: {format_duration(remaining * rtf)} "
+                f"(RTF {rtf:.2f}, {format_duration(remaining)} di audio rimanenti su {format_duration(self.total)})")
@@ -0,0 +1,114 @@
+#------------------------------------------
+# segment_align_cache.py
+#------------------------------------------
+# Per-segment cache of alignment results.
+# Each segment is keyed by its start/end (at the 0.1 s resolution of the txt
+# transcripts, so segments read back from a txt match the ASR ones), its
+# whitespace-normalized text and the align settings. After a transcript is
+# hand-corrected, only the segments whose key changed are aligned again; the
+# others come from the cache. Entries of one recording live in a single JSON
+# file, CACHE_DIR/aligned_segments/<audio sha256>.json, grouped by align
+# settings.
+# Size bound: whenever segments are aligned, the group of those settings keeps
+# only the segments of the transcript just aligned. Entries of a previous
+# transcription (re-transcribed or corrected segments) are dropped there, so
+# each recording holds at most one transcript per align settings.
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from audio_cache import CACHE_DIR, audio_hash
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def segment_key(seg, settings: dict) -> str:
+    payload = json.dumps([f"{seg['start']:.1f}", f"{seg['end']:.1f}", normalize_text(seg["text"]), settings],
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def settings_key(settings: dict) -> str:
+    payload = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entries_path(audio_path):
+    return CACHE_DIR / "aligned_segments" / f"{audio_hash(audio_path)}.json"
+
+
+def _read(audio_path) -> dict:
+    """{settings key: {segment key: aligned segments}} of one recording ({} if none)."""
+    path = _entries_path(audio_path)
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read cache entry {path.name}: {e}")
+        return {}
+    if any(isinstance(v, list) for v in data.values()):
+        # an ungrouped file of earlier versions: its segment keys hold the
+        # settings, so it still answers lookups until the next save
+        return {None: data}
+    return data
+
+
+def load_entries(audio_path, settings: dict) -> dict:
+    """{segment key: aligned segments} of one recording under `settings` ({} if none)."""
+    data = _read(audio_path)
+    return data.get(settings_key(settings)) or data.get(None, {})
+
+
+def save_entries(audio_path, settings: dict, entries: dict) -> None:
+    """Replace the entries of `settings` (the other settings' are kept)."""
+    data = {k: v for k, v in _read(audio_path).items() if k is not None}
+    data[settings_key(settings)] = entries
+    path = _entries_path(audio_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=float)
+    os.replace(tmp, path)
+
+
+def align_cached(jobs, settings: dict, align_fn, use_cache=True):
+    """
+    jobs: {audio_path: (audio, segments)}.
+    align_fn({audio_path: (audio, segments)}) -> {audio_path: [aligned segments
+    of each input segment]} is called once, with only the segments not in the
+    cache. Returns {audio_path: aligned} in the whisperx.align shape.
+    """
+    entries, keys, missing = {}, {}, {}
+    for ap, (audio, segments) in jobs.items():
+        entries[ap] = load_entries(ap, settings) if use_cache else {}
+        keys[ap] = [segment_key(seg, settings) for seg in segments]
+        todo = [i for i, k in enumerate(keys[ap]) if k not in entries[ap]]
+        if todo:
+            missing[ap] = todo
+        if use_cache and segments:
+            print(f"[ALIGN] {Path(ap).name}: {len(todo)}/{len(segments)} segmenti da allineare")
+
+    if missing:
+        fresh = align_fn({ap: (jobs[ap][0], [jobs[ap][1][i] for i in todo]) for ap, todo in missing.items()})
+        for ap, todo in missing.items():
+            for i, aligned_segs in zip(todo, fresh[ap]):
+                entries[ap][keys[ap][i]] = aligned_segs
+            if use_cache:
+                # only this transcript's segments: the stale ones are dropped
+                save_entries(ap, settings, {k: entries[ap][k] for k in keys[ap]})
+
+    results = {}
+    for ap, (_, segments) in jobs.items():
+        segs = []
+        for seg, k in zip(segments, keys[ap]):
+            # per-segment annotations (e.g. "features" of targeted alignment) are not cached
+            extra = {"features": seg["features"]} if "features" in seg else {}
+            segs += [{**out, **extra} for out in entries[ap][k]]
+        results[ap] = {"segments": segs, "word_segments": [w for s in segs for w in s.get("words", [])]}
+    return results
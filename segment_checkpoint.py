@@ -0,0 +1,102 @@
+#------------------------------------------
+# segment_checkpoint.py
+#------------------------------------------
+# Segment-level checkpoints for long recordings.
+# Every segment yielded by faster-whisper is appended to a JSON-lines file
+# (flushed and fsync'ed) before it is passed on. After a crash or Ctrl-C the
+# committed segments are read back, with their exact float timestamps, and the
+# transcription restarts from the end of the last one instead of from zero.
+#
+# Checkpoints live under CACHE_DIR/checkpoints/<key>.jsonl, where <key> is the
+# transcription cache key: a checkpoint is only resumed with the same audio
+# content and the same ASR settings.
+#
+# The same key can come up in two jobs at once (a recording copied in two
+# folders, two workers, transcrive.py and transcrive_txt.py side by side):
+# only the holder of locked(key) writes or resumes the checkpoint, the other
+# waits for it to finish.
+
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+
+from audio_cache import CACHE_DIR
+
+
+def checkpoint_path(key: str):
+    return CACHE_DIR / "checkpoints" / f"{key}.jsonl"
+
+
+@contextmanager
+def locked(key: str):
+    """
+    Exclusive lock on the checkpoint of `key` (flock on <key>.lock, so it
+    holds between processes and between threads). Waits while another job
+    holds it; yields True if it had to wait, so the caller can look for the
+    result that job left in the cache.
+    """
+    path = checkpoint_path(key).with_suffix(".lock")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        waited = False
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            waited = True
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield waited
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load(key: str) -> list:
+    """
+    Committed segments of an interrupted run ([] if there is none).
+    A last line torn by the crash is dropped, and cut from the file so that
+    new segments are appended after the last complete one.
+    """
+    path = checkpoint_path(key)
+    if not path.exists():
+        return []
+
+    segments = []
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                segments.append(json.loads(line.decode("utf-8")))
+            except ValueError:
+                break
+            valid_bytes += len(line)
+
+    if valid_bytes != path.stat().st_size:
+        with open(path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return segments
+
+
+class CheckpointWriter:
+    """Append-only writer: a segment is committed once commit() returns.
+    Only to be used while holding locked(key)."""
+
+    def __init__(self, key: str):
+        self.path = checkpoint_path(key)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "a", encoding="utf-8")
+
+    def commit(self, seg: dict) -> None:
+        self._f.write(json.dumps(seg, ensure_ascii=False) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        self._f.close()
+
+    def remove(self) -> None:
+        """The file is complete: the checkpoint is no longer needed."""
+        self.close()
+        self.path.unlink(missing_ok=True)
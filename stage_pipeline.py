@@ -0,0 +1,99 @@
+#------------------------------------------
+# stage_pipeline.py
+#------------------------------------------
+# Staged producer/consumer pipeline.
+# Each stage runs in its own thread and hands its result to the next one
+# through a bounded queue, so different files are in different stages at the
+# same time (e.g. ASR of file N+1 while file N is being aligned). The heavy
+# work (CTranslate2, torch) releases the GIL, so threads are enough.
+#
+# Per-stage busy time is recorded: the stage with utilization close to 100%
+# is the bottleneck, the others spend the rest of the time waiting.
+
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.busy = 0.0
+        self.items = 0
+        self.errors = 0
+
+
+class Pipeline:
+    """
+    stages: list of (name, fn) where fn(item, value) returns the value passed
+    to the next stage. The first stage receives value=None.
+    """
+
+    def __init__(self, stages, maxsize=2):
+        self.stages = stages
+        self.maxsize = maxsize
+        self.stats = [StageStats(name) for name, _ in stages]
+        self.wall = 0.0
+
+    def _worker(self, fn, stats, in_q, out_q):
+        while True:
+            job = in_q.get()
+            if job is _DONE:
+                out_q.put(_DONE)
+                return
+            item, value, error = job
+            if error is None:
+                t0 = time.perf_counter()
+                try:
+                    value = fn(item, value)
+                except Exception as e:
+                    value, error = None, e
+                    stats.errors += 1
+                stats.busy += time.perf_counter() - t0
+                stats.items += 1
+            # a failed item skips the remaining stages but still reaches the end
+            out_q.put((item, value, error))
+
+    def run(self, items):
+        """Yield (item, result, error) for every item, in completion order."""
+        # bounded queues between stages, unbounded at the end (read by the caller)
+        queues = [queue.Queue(maxsize=self.maxsize) for _ in self.stages] + [queue.Queue()]
+        threads = [
+            threading.Thread(target=self._worker, args=(fn, stats, queues[i], queues[i + 1]), daemon=True)
+            for i, ((_, fn), stats) in enumerate(zip(self.stages, self.stats))
+        ]
+
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+
+        def feed():
+            for item in items:
+                queues[0].put((item, None, None))
+            queues[0].put(_DONE)
+
+        threading.Thread(target=feed, daemon=True).start()
+
+        while True:
+            job = queues[-1].get()
+            if job is _DONE:
+                break
+            yield job
+        for t in threads:
+            t.join()
+        self.wall = time.perf_counter() - t0
+
+    def report(self):
+        """Print busy time and utilization of each stage."""
+        print(f"\n{'Stage':<12} {'Busy':>10} {'Utilization':>12} {'Files':>7} {'Errors':>7}")
+        print("-" * 52)
+        for s in self.stats:
+            util = s.busy / self.wall if self.wall else 0.0
+            print(f"{s.name:<12} {s.busy:9.1f}s {util:11.0%} {s.items:>7} {s.errors:>7}")
+        print("-" * 52)
+        print(f"{'Wall time':<12} {self.wall:9.1f}s")
+        if self.stats:
+            bottleneck = max(self.stats, key=lambda s: s.busy)
+            print(f"Bottleneck: {bottleneck.name}")
@@ -0,0 +1,161 @@
+#------------------------------------------
+# stage_timing.py
+#------------------------------------------
+# Per-file, per-stage timing.
+# The code that does the work marks its stages with `timed("asr")`,
+# `timed("decode")`, ... ; the time is credited to the file set with
+# `for_file(path)` in the same thread (stage_pipeline runs each stage in its
+# own thread, so both are per thread). Nested stages are exclusive: the time
+# spent decoding inside the ASR stage counts as "decode", not as "asr".
+# When a file is done, finish() appends one JSON line to the log:
+#   {"run", "file", "audio_seconds", "total", "rtf", "stages": {...}, "error"}
+#
+# Outside for_file() the markers cost nothing and record nothing.
+#
+# Summary over a log (per-stage percentiles, last run by default):
+#   python stage_timing.py timing.jsonl
+#   python stage_timing.py timing.jsonl --all
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+# same id in the spawned workers, which inherit the environment
+RUN_ID = os.environ.setdefault("JR_TIMING_RUN", time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+_local = threading.local()
+_lock = threading.Lock()
+_timers = {}
+
+
+@contextmanager
+def for_file(name):
+    """Credit the stages timed in this thread to `name`."""
+    prev = getattr(_local, "file", None)
+    _local.file = str(name)
+    with _lock:
+        _timers.setdefault(str(name), defaultdict(float))
+    try:
+        yield
+    finally:
+        _local.file = prev
+
+
+@contextmanager
+def timed(stage):
+    file = getattr(_local, "file", None)
+    if file is None:
+        yield
+        return
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    _local.stack.append(0.0)  # time spent in nested stages
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        nested = _local.stack.pop()
+        if _local.stack:
+            _local.stack[-1] += elapsed
+        with _lock:
+            _timers[file][stage] += elapsed - nested
+
+
+def add(name, stage, seconds):
+    """Credit time measured elsewhere (e.g. a share of a batch) to a file."""
+    with _lock:
+        _timers.setdefault(str(name), defaultdict(float))[stage] += seconds
+
+
+def finish(name, audio_seconds, log_path=None, error=None):
+    """Close the record of a file; append it to log_path (JSON lines) if given."""
+    with _lock:
+        stages = dict(_timers.pop(str(name), {}))
+    total = sum(stages.values())
+    record = {
+        "run": RUN_ID,
+        "file": Path(name).name,
+        "audio_seconds": round(audio_seconds, 3),
+        "total": round(total, 3),
+        "rtf": round(total / audio_seconds, 4) if audio_seconds else None,
+        "stages": {k: round(v, 3) for k, v in stages.items()},
+        "error": error,
+    }
+    if log_path is not None:
+        Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+        # one write per line in append mode: lines from parallel workers do not mix
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return record
+
+
+# --------- SUMMARY ---------
+def percentile(values, q):
+    """Linear-interpolated percentile of a non-empty list (q in 0..100)."""
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def read_log(path):
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue  # torn last line of an interrupted run
+    return records
+
+
+def summary(records):
+    """Print per-stage percentiles (seconds per file) and share of the total time."""
+    stages = defaultdict(list)
+    for r in records:
+        for stage, seconds in r["stages"].items():
+            stages[stage].append(seconds)
+    grand_total = sum(r["total"] for r in records) or 1.0
+    audio = sum(r["audio_seconds"] for r in records)
+    errors = sum(1 for r in records if r.get("error"))
+
+    print(f"\n{len(records)} file, {audio / 3600:.2f}h di audio, {errors} errori")
+    print(f"\n{'Stage':<10} {'Files':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'Max':>8} {'Total':>9} {'Share':>7}")
+    print("-" * 70)
+    for stage, values in sorted(stages.items(), key=lambda kv: -sum(kv[1])):
+        print(f"{stage:<10} {len(values):>6} {percentile(values, 50):7.2f}s {percentile(values, 90):7.2f}s "
+              f"{percentile(values, 99):7.2f}s {max(values):7.2f}s {sum(values):8.1f}s {sum(values) / grand_total:6.0%}")
+    rtfs = [r["rtf"] for r in records if r.get("rtf") is not None]
+    if rtfs:
+        print("-" * 70)
+        print(f"{'RTF':<10} {len(rtfs):>6} {percentile(rtfs, 50):8.3f} {percentile(rtfs, 90):8.3f} "
+              f"{percentile(rtfs, 99):8.3f} {max(rtfs):8.3f}   (overall {grand_total / audio:.3f})")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage timing summary of a transcription run.")
+    parser.add_argument("log", type=Path, help="JSON-lines timing log (TIMING_LOG in transcrive.py).")
+    parser.add_argument("--run", help="Run id to summarize (default: the last one in the log).")
+    parser.add_argument("--all", action="store_true", help="Summarize every run in the log.")
+    args = parser.parse_args()
+
+    records = read_log(args.log)
+    if not records:
+        raise SystemExit(f"Nessun record in {args.log}")
+    if not args.all:
+        run = args.run or records[-1]["run"]
+        records = [r for r in records if r["run"] == run]
+        print(f"Run {run}")
+    summary(records)
+
+
+if __name__ == "__main__":
+    main()
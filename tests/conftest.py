@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The caches live under ~/.cache (audio_cache.CACHE_DIR, read at import):
+# the tests get a home of their own before any module of the repo is imported.
+os.environ["HOME"] = tempfile.mkdtemp(prefix="jr_tests_")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
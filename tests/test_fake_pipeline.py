@@ -0,0 +1,132 @@
+"""
+The whole pipeline offline, on synthetic audio with the fake backends and the
+VAD on: speech is cut out, decoded on its own and mapped back onto the
+recording (transcription.iter_segments / restore_timestamps), so segment
+times must land on the bursts of the original audio.
+"""
+
+import json
+
+import pytest
+
+import backends
+import transcription
+import transcrive
+import vad_cache
+
+SECONDS = 60
+TOLERANCE = 0.02  # seconds: one energy frame plus rounding
+
+# min_silence_duration_ms=100 splits the utterances themselves into several
+# speech chunks, so segments span chunks (the case of the end mapping)
+VAD_CASES = {"default": None, "split": {"min_silence_duration_ms": 100}}
+
+
+def utterances(audio):
+    """[(start, end, text)] of the synthetic utterances, read on the original timeline."""
+    out, words = [], []
+    for start, end, word, last in backends.bursts(audio):
+        words.append((start, end, word))
+        if last:
+            out.append((words[0][0], words[-1][1], " ".join(w for _, _, w in words)))
+            words = []
+    if words:
+        out.append((words[0][0], words[-1][1], " ".join(w for _, _, w in words)))
+    return out
+
+
+def assert_on_utterances(segments, audio):
+    expected = utterances(audio)
+    assert [seg["text"].strip() for seg in segments] == [text for _, _, text in expected]
+    for seg, (start, end, _) in zip(segments, expected):
+        assert seg["start"] == pytest.approx(start, abs=TOLERANCE)
+        assert seg["end"] == pytest.approx(end, abs=TOLERANCE)
+
+
+def fake_settings(vad_parameters, word_timestamps=False):
+    settings = transcription.transcription_settings("fake", "int8", "it", vad_parameters,
+                                                    word_timestamps=word_timestamps)
+    settings["asr_backend"] = "fake"
+    return settings
+
+
+@pytest.mark.parametrize("align_mode", ["whisperx", "whisper"])
+@pytest.mark.parametrize("vad", list(VAD_CASES))
+def test_pipeline_with_vad(tmp_path, monkeypatch, capsys, vad, align_mode):
+    seed = 3 if vad == "default" else 4
+    ap = tmp_path / "synth.wav"
+    backends.write_synthetic(ap, SECONDS, seed)
+    audio = backends.synth_audio(SECONDS, seed)
+
+    for name, value in {"AUDIO_DIR": tmp_path, "ASR_BACKEND": "fake", "ALIGN_BACKEND": "fake",
+                        "ALIGN_MODE": align_mode, "VAD_PARAMETERS": VAD_CASES[vad], "TIMING_LOG": None,
+                        "WORKERS": 1, "PIPELINE": False, "ALIGN_BATCH_SIZE": 0}.items():
+        monkeypatch.setattr(transcrive, name, value)
+    settings = transcrive.asr_settings()
+    assert settings["vad_filter"]
+
+    transcrive.main()
+    assert "[ERR]" not in capsys.readouterr().out
+
+    paths = transcrive.output_paths(ap)
+    assert paths["textgrid"].exists()
+    with open(paths["json"], encoding="utf-8") as f:
+        segments = json.load(f)["segments"]
+    assert_on_utterances(segments, audio)
+    assert all(seg["words"] for seg in segments)
+    assert len(paths["txt"].read_text(encoding="utf-8").splitlines()) == len(segments)
+
+    chunks = vad_cache.get_speech_chunks(ap, audio, settings["vad_parameters"],
+                                         backend=transcription.asr_backend(settings))
+    assert len(chunks) > 1
+    if vad == "split":
+        bounds = [c["end"] / backends.SAMPLE_RATE for c in chunks]
+        assert any(seg["start"] < b < seg["end"] for seg in segments for b in bounds)
+
+
+@pytest.mark.parametrize("word_timestamps", [False, True])
+def test_resume_matches_full_run(tmp_path, capsys, word_timestamps):
+    ap = tmp_path / "synth.wav"
+    backends.write_synthetic(ap, SECONDS, seed=5)
+    settings = fake_settings(VAD_CASES["split"], word_timestamps)
+
+    full = list(transcription.iter_transcription(ap, settings, use_cache=False))
+    assert_on_utterances(full, backends.synth_audio(SECONDS, 5))
+
+    interrupted = transcription.iter_transcription(ap, settings, use_cache=False)
+    for _ in range(len(full) // 2):
+        next(interrupted)
+    interrupted.close()
+
+    resumed = list(transcription.iter_transcription(ap, settings, use_cache=False))
+    assert "[RESUME]" in capsys.readouterr().out
+    assert [seg["text"] for seg in resumed] == [seg["text"] for seg in full]
+    for seg, ref in zip(resumed, full):
+        assert seg["start"] == pytest.approx(ref["start"], abs=TOLERANCE)
+        assert seg["end"] == pytest.approx(ref["end"], abs=TOLERANCE)
+
+
+def test_targeted_alignment_keeps_every_segment_in_textgrid(tmp_path, monkeypatch, capsys):
+    from praatio import textgrid
+
+    seed = 6
+    ap = tmp_path / "synth.wav"
+    backends.write_synthetic(ap, SECONDS, seed)
+    expected = utterances(backends.synth_audio(SECONDS, seed))
+
+    for name, value in {"AUDIO_DIR": tmp_path, "ASR_BACKEND": "fake", "ALIGN_BACKEND": "fake",
+                        "ALIGN_MODE": "whisperx", "ALIGN_TARGETS": {"mente"}, "VAD_PARAMETERS": None,
+                        "TIMING_LOG": None, "WORKERS": 1, "PIPELINE": False, "ALIGN_BATCH_SIZE": 0}.items():
+        monkeypatch.setattr(transcrive, name, value)
+    transcrive.main()
+    assert "[ERR]" not in capsys.readouterr().out
+
+    paths = transcrive.output_paths(ap)
+    with open(paths["json"], encoding="utf-8") as f:
+        aligned = json.load(f)["segments"]
+    assert 0 < len(aligned) < len(expected)
+    assert all("mente" in seg["features"] for seg in aligned)
+
+    words = textgrid.openTextgrid(str(paths["textgrid"]), includeEmptyIntervals=False).getTier("words")
+    for start, end, _ in expected:
+        assert any(start - TOLERANCE <= e.start and e.end <= end + TOLERANCE for e in words.entries)
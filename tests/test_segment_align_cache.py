@@ -0,0 +1,19 @@
+import backends
+import segment_align_cache
+
+
+def test_entries_keep_one_transcript_per_settings(tmp_path):
+    ap = tmp_path / "synth.wav"
+    backends.write_synthetic(ap, 10, seed=8)
+    aligner = backends.FakeAligner()
+    first = [{"start": 0.5, "end": 1.5, "text": " casa sempre"}, {"start": 2.0, "end": 3.0, "text": " rosa"}]
+    corrected = [first[0], {"start": 2.0, "end": 3.0, "text": " rosa pizza"}]
+    settings, other = {"align_language": "it"}, {"align_language": "it", "align_backend": "fake"}
+
+    segment_align_cache.align_cached({ap: (None, first)}, other, aligner.align)
+    segment_align_cache.align_cached({ap: (None, first)}, settings, aligner.align)
+    segment_align_cache.align_cached({ap: (None, corrected)}, settings, aligner.align)
+
+    entries = segment_align_cache.load_entries(ap, settings)
+    assert set(entries) == {segment_align_cache.segment_key(seg, settings) for seg in corrected}
+    assert len(segment_align_cache.load_entries(ap, other)) == len(first)
@@ -0,0 +1,193 @@
+#------------------------------------------
+# transcription.py
+#------------------------------------------
+# ASR core shared by transcrive.py, transcrive_txt.py and the daemon:
+# decoded audio (audio_cache) -> ASR backend (faster-whisper) -> segment dicts
+# {"start", "end", "text"} (plus Whisper's confidence measures), with the
+# content-addressed transcription cache and segment checkpoints to resume
+# interrupted files.
+
+from pathlib import Path
+
+import backends
+import escalation
+import long_audio
+import segment_checkpoint
+import transcription_cache
+import vad_cache
+from audio_cache import SAMPLE_RATE, load_audio
+
+# On resume, the text of the last committed segments is given back to Whisper
+# as prompt, as condition_on_previous_text would have done without the crash
+RESUME_PROMPT_SEGMENTS = 10
+
+
+def transcription_settings(model_size, compute_type, language, vad_parameters=None, batch_size=0,
+                           chunk_seconds=0, word_timestamps=False, escalation_model_size=None,
+                           escalation_thresholds=None) -> dict:
+    """
+    Every setting that changes the transcription. It is also the key of the
+    transcription, VAD and checkpoint caches, so the scripts, benchmarks and
+    calibration all build it here, and the same decoding gives the same keys
+    everywhere.
+    """
+    escalation = None
+    if escalation_model_size:
+        escalation = {"model_size": escalation_model_size, **(escalation_thresholds or {})}
+    return {
+        "model_size": model_size,
+        "compute_type": compute_type,
+        "language": language,
+        "vad_filter": True,
+        "vad_parameters": vad_parameters,
+        "batch_size": batch_size,
+        "chunk_seconds": chunk_seconds,
+        "word_timestamps": word_timestamps,
+        "escalation": escalation,
+    }
+
+
+def iter_segments(audio, settings: dict, cpu_threads=8, offset=0.0, initial_prompt=None, speech_chunks=None):
+    """
+    Run the ASR backend on `audio` and yield segment dicts as they are decoded.
+    `offset` (seconds) is added to every timestamp, for audio that does not
+    start at the beginning of the recording.
+    With settings["batch_size"] > 0 the audio is cut into VAD speech chunks and
+    several chunks are decoded per forward pass (BatchedInferencePipeline).
+    `speech_chunks` ({"start", "end"} in samples, see vad_cache) replaces the
+    VAD pass that faster-whisper would otherwise run.
+    With settings["word_timestamps"], each segment also gets "words":
+    [{"word", "start", "end", "probability"}] from the decoder's cross-attention.
+    settings["asr_backend"] (see backends; default faster-whisper) is the model
+    that decodes, e.g. the fake backend for offline runs.
+    """
+    backend = asr_backend(settings)
+    if speech_chunks is not None:
+        if not speech_chunks:
+            return  # no speech at all
+        settings = {**settings, "vad_filter": False}
+
+    ts_map = None
+    if speech_chunks is not None:
+        # same as vad_filter=True: decode only the speech, then map the
+        # timestamps back onto the original timeline; the batched pipeline
+        # gets the clips of that speech it would have cut itself
+        import numpy as np
+        from faster_whisper.vad import SpeechTimestampsMap
+
+        audio = np.concatenate([audio[c["start"]:c["end"]] for c in speech_chunks])
+        ts_map = SpeechTimestampsMap(speech_chunks, SAMPLE_RATE)
+        speech_chunks = vad_cache.merge_for_batches(speech_chunks) if settings.get("batch_size") else None
+
+    for seg in backend.transcribe(audio, settings, cpu_threads, initial_prompt, speech_chunks):
+        yield restore_timestamps(seg, ts_map, offset)
+
+
+def asr_backend(settings: dict) -> backends.ASRBackend:
+    """The ASR backend of `settings` (see backends.get_backend)."""
+    return backends.get_backend("asr", settings.get("asr_backend") or "faster-whisper")
+
+
+def restore_timestamps(seg, ts_map=None, offset=0.0):
+    """
+    A segment decoded on the concatenated speech of `ts_map` (a faster-whisper
+    SpeechTimestampsMap; None: on the audio as is) back on the original
+    timeline, plus `offset`. As faster-whisper's restore_speech_timestamps
+    does with vad_filter=True: each word is mapped by the chunk holding its
+    middle and the segment spans its first to last word; without words, start
+    and end are mapped each on its own (the end of a chunk stays in it).
+    """
+    if ts_map is not None:
+        if seg.get("words"):
+            for w in seg["words"]:
+                chunk_index = ts_map.get_chunk_index((w["start"] + w["end"]) / 2)
+                w["start"] = ts_map.get_original_time(w["start"], chunk_index)
+                w["end"] = ts_map.get_original_time(w["end"], chunk_index)
+            seg["start"], seg["end"] = seg["words"][0]["start"], seg["words"][-1]["end"]
+        else:
+            seg["start"] = ts_map.get_original_time(seg["start"])
+            seg["end"] = ts_map.get_original_time(seg["end"], is_end=True)
+    seg["start"] += offset
+    seg["end"] += offset
+    for w in seg.get("words") or []:
+        w["start"] += offset
+        w["end"] += offset
+    return seg
+
+
+def iter_transcription(audio_path: Path, settings: dict, cpu_threads=8, use_cache=True, chunk_workers=1):
+    """
+    Segments of `audio_path`. On a cache hit (same audio content and same
+    settings, whatever the file name) they come straight from the cache;
+    otherwise they are transcribed, yielded as they come, and cached at the end.
+    Each new segment is checkpointed first: if a previous run was interrupted,
+    its committed segments are yielded again and only the rest is transcribed.
+    With settings["chunk_seconds"] > 0 the file is cut at VAD silences and the
+    pieces are transcribed by `chunk_workers` processes (see long_audio).
+    With settings["escalation"], weak segments are decoded again with a larger
+    model before being committed (see escalation).
+    A job already transcribing the same content with the same settings (the
+    checkpoint is locked) is waited for, and its result taken from the cache.
+    """
+    key = transcription_cache.cache_key(audio_path, settings)
+    if use_cache:
+        cached = transcription_cache.load(key)
+        if cached is not None:
+            print(f"[CACHE] {Path(audio_path).name}: trascrizione già in cache")
+            yield from cached
+            return
+
+    with segment_checkpoint.locked(key) as waited:
+        if waited:
+            cached = transcription_cache.load(key) if use_cache else None
+            if cached is not None:
+                print(f"[CACHE] {Path(audio_path).name}: trascritta intanto da un altro job")
+                yield from cached
+                return
+        yield from _transcribe(audio_path, key, settings, cpu_threads, chunk_workers)
+
+
+def _transcribe(audio_path, key, settings, cpu_threads, chunk_workers):
+    """iter_transcription on a cache miss, with the checkpoint of `key` locked."""
+    committed = segment_checkpoint.load(key)
+    audio = load_audio(audio_path)
+    speech_chunks = None
+    if settings["vad_filter"]:
+        # speech regions come from the VAD cache after the first run
+        speech_chunks = vad_cache.get_speech_chunks(audio_path, audio, settings["vad_parameters"],
+                                                    batched=bool(settings.get("batch_size")),
+                                                    backend=asr_backend(settings))
+    offset, prompt = 0.0, None
+    if committed:
+        offset = committed[-1]["end"]
+        prompt = "".join(seg["text"] for seg in committed[-RESUME_PROMPT_SEGMENTS:]).strip() or None
+        print(f"[RESUME] {Path(audio_path).name}: {len(committed)} segmenti già salvati, riparto da {offset:.1f}s")
+        yield from committed
+    offset_samples = int(offset * SAMPLE_RATE)
+
+    if settings.get("chunk_seconds"):
+        pieces = long_audio.plan_pieces(len(audio), speech_chunks, settings["chunk_seconds"], offset_samples)
+        if len(pieces) > 1:
+            print(f"[CHUNK] {Path(audio_path).name}: {len(pieces)} parti, {min(chunk_workers, len(pieces))} worker")
+        seg_iter = long_audio.iter_pieces(audio_path, pieces, settings, cpu_threads, chunk_workers, prompt)
+    else:
+        if speech_chunks is not None:
+            speech_chunks = vad_cache.clip_chunks(speech_chunks, offset_samples)
+        seg_iter = iter_segments(audio[offset_samples:], settings, cpu_threads, offset=offset,
+                                 initial_prompt=prompt, speech_chunks=speech_chunks)
+    if settings.get("escalation"):
+        seg_iter = escalation.iter_escalated(seg_iter, audio, settings, cpu_threads, audio_path)
+
+    checkpoint = segment_checkpoint.CheckpointWriter(key)
+    try:
+        for seg in seg_iter:
+            checkpoint.commit(seg)
+            yield seg
+    finally:
+        checkpoint.close()
+
+    # only a complete transcription is cached; the segments are read back
+    # from the checkpoint (no other job writes it while locked(key) is held),
+    # so they are never all kept in memory while decoding
+    transcription_cache.save(key, segment_checkpoint.load(key), settings)
+    checkpoint.remove()
@@ -0,0 +1,45 @@
+#------------------------------------------
+# transcription_cache.py
+#------------------------------------------
+# Content-addressed cache of transcription results.
+# The key is the sha256 of the audio content plus every setting that changes
+# the result (model size, compute type, language, VAD settings, ...), so a file
+# copied under another name or folder (e.g. laureato/, non-laureato/) is a hit.
+# Entries are small JSON files under CACHE_DIR/transcriptions/.
+
+import hashlib
+import json
+import os
+
+from audio_cache import CACHE_DIR, audio_hash
+
+
+def cache_key(audio_path, settings: dict) -> str:
+    payload = json.dumps({"audio": audio_hash(audio_path), **settings}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str):
+    return CACHE_DIR / "transcriptions" / f"{key}.json"
+
+
+def load(key: str):
+    """Cached data for `key`, or None on a miss (or an unreadable entry)."""
+    path = _entry_path(key)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["data"]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: Could not read cache entry {path.name}: {e}")
+        return None
+
+
+def save(key: str, data, settings: dict) -> None:
+    path = _entry_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"settings": settings, "data": data}, f, ensure_ascii=False, default=float)
+    os.replace(tmp, path)
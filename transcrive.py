@@ -1,56 +1,166 @@
+#------------------------------------------
+# transcrive.py
+#------------------------------------------
+# This script transcribes the audio files of AUDIO_DIR and writes, for each
+# one, a txt transcript, a TextGrid (words, phones, g2p) and the WhisperX JSON.
 
-
-import os
+import json
 import re
+import sys
+import time
 from pathlib import Path
-import torch
-from faster_whisper import WhisperModel
-import whisperx
 from praatio import textgrid as tg
 
+import segment_align_cache
+import stage_timing
+import transcription_cache
+from asr_models import get_align_model, get_g2p, load_profile, set_torch_threads
+from asr_pool import memory_usage, plan_threads, pool_pids, run_pool, run_threads
+from scheduling import EtaTracker, audio_duration, format_duration, longest_first
+from stage_pipeline import Pipeline
+from stage_timing import timed
+from audio_cache import CACHE_DIR, load_audio, open_windowed
+from backends import get_backend
+from transcription import asr_backend, iter_transcription, transcription_settings
+from transcrive_txt import save_transcription_to_txt
+
 # --------- CONFIG ---------
 AUDIO_DIR = Path("/Users/ginasaviano/Documents/Gent/JR_audio")  # <--- CAMBIA QUI
 LANGUAGE = "it"
 ASR_MODEL_SIZE = "medium"
+COMPUTE_TYPE = "int8"         # se int8 non è supportato si usa float32
+BATCH_SIZE = 0                # >0: decodifica questi chunk VAD per forward pass (modalità batched); 0 = sequenziale
+CHUNK_SECONDS = 0             # >0: taglia i file lunghi nei silenzi VAD in parti di ~questa durata (es. 600)
+CHUNK_WORKERS = 4             # processi che trascrivono in parallelo le parti di un file (solo con WORKERS = 1)
+VAD_PARAMETERS = None         # es. {"min_silence_duration_ms": 500}; None = default di faster-whisper
+TRANSCRIPTION_CACHE = True    # riusa trascrizione e allineamento di audio già processati (stesse impostazioni)
+SEGMENT_ALIGN_CACHE = True    # allineamento in cache per segmento: dopo una correzione si riallinea solo ciò che è cambiato
+ESCALATION_MODEL_SIZE = None  # es. "large-v3": ridecodifica con questo modello solo i segmenti poco affidabili
+ESCALATION_THRESHOLDS = {"avg_logprob": -0.7, "no_speech_prob": 0.6, "compression_ratio": 2.4}
+CPU_THREADS = 8   # budget totale di thread: diviso tra i worker e, in ogni worker, tra ASR (CTranslate2) e torch
+WORKERS = 1       # >1: N processi, ognuno con i propri modelli e CPU_THREADS // N thread
+WORKER_SHARING = "none"  # con WORKERS > 1, come i worker condividono i pesi dei modelli:
+                         # "none":    processi separati, ognuno carica i propri modelli
+                         # "fork":    il modello di allineamento (torch) è caricato una volta prima del fork e i
+                         #            processi ne condividono le pagine; Whisper resta uno per processo (solo Linux)
+                         # "threads": un solo processo con WORKERS thread: un modello Whisper con WORKERS worker
+                         #            CTranslate2 e un solo modello di allineamento per tutti
+PIPELINE = False  # True: ASR, allineamento e scrittura TextGrid in stadi paralleli (code limitate)
+PIPELINE_QUEUE_SIZE = 2  # file in attesa tra uno stadio e il successivo
+ALIGN_THREAD_SHARE = 0.5  # con PIPELINE: quota dei thread data a torch (ASR e allineamento girano insieme)
+LONGEST_FIRST = True          # prima i file più lunghi (durate lette dagli header)
+ALIGN_MODE = "whisperx"       # "whisperx": allineamento forzato wav2vec2 (preciso, con foni)
+                              # "whisper": timestamp di parola dal decoder di faster-whisper (veloce, approssimati)
+ALIGN_BACKEND = "torch"       # "onnx" / "onnx-int8": modello di allineamento esportato per onnxruntime
+                              # (onnx_align.py; esportato al primo uso), senza torch a run time
+                              # "fake": parole e foni deterministici senza modello (backends.py)
+ASR_BACKEND = "faster-whisper"  # "fake": segmenti deterministici dall'audio sintetico di backends.py, senza modelli
+                                # (con la sua VAD): per profilare e verificare la pipeline offline (tests/)
+FAKE_RTF = 0.0                # backend "fake": secondi di calcolo simulato per secondo di audio (ASR e allineamento)
+ALIGN_BATCH_SIZE = 0          # >0: segmenti di durata simile allineati in un'unica forward pass (batched_align)
+ALIGN_GROUP_FILES = 4         # con ALIGN_BATCH_SIZE: file i cui segmenti vengono allineati insieme
+ALIGN_TARGETS = None          # es. {"mente", "syntactic_gemination"} o "all": allinea solo i segmenti in cui i
+                              # detector di Scripts_JR trovano candidati (vedi feature_targets.py); None = tutti
+ALIGN_WINDOWED = False        # True: l'allineamento legge dal disco solo una finestra attorno a ogni segmento
+                              # (memoria costante anche su registrazioni di ore)
+ALIGN_WINDOW_PAD = 0.5        # con ALIGN_WINDOWED: secondi di audio tenuti attorno a ogni segmento
+USE_CALIBRATION = True        # usa COMPUTE_TYPE / CPU_THREADS / WORKERS misurati da calibrate_asr.py, se presenti
+# Output scritti da un'unica passata ASR:
+#   "txt"      -> transcriptions/<stem>.txt   (formato [MM:SS.S - MM:SS.S], per gli script regex)
+#   "textgrid" -> <stem>.TextGrid             (parole, foni, g2p_lex)
+#   "json"     -> whisperx_output/<stem>.json (segments[].words[], per gli script word-level)
+OUTPUT_FORMATS = {"txt", "textgrid", "json"}
+TIMING_LOG = CACHE_DIR / "timing.jsonl"  # tempi per stadio di ogni file (JSON lines, vedi stage_timing.py); None = niente log
 EPS = 1e-3
 MIN_DUR = 1e-4
 
-print("Looking in:", AUDIO_DIR.resolve()) #trying to debug path issue
+# --------- PROFILO DI CALIBRAZIONE ---------
+# Letto all'import, così anche i worker (spawn) vedono gli stessi valori
+_profile = load_profile(ASR_MODEL_SIZE) if USE_CALIBRATION else {}
+COMPUTE_TYPE = _profile.get("compute_type", COMPUTE_TYPE)
+CPU_THREADS = _profile.get("cpu_threads", CPU_THREADS)
+WORKERS = _profile.get("workers", WORKERS)
+
+# --------- BUDGET DI THREAD ---------
+# Calcolato all'import come il profilo, così ogni worker trova la sua quota:
+# {"workers", "ct2", "torch_intra", "torch_inter"} (vedi asr_pool.plan_threads)
+THREADS = plan_threads(CPU_THREADS, WORKERS, overlap=PIPELINE and WORKERS == 1, align_share=ALIGN_THREAD_SHARE)
+
+
+# --------- MODELS (lazy) ---------
+# torch / faster_whisper / whisperx / epitran are imported on first use only,
+# so an empty AUDIO_DIR exits immediately.
+def load_models(cpu_threads=None):
+    """Load ASR and align models in this process (once per worker), with the
+    thread counts of THREADS."""
+    set_torch_threads(THREADS["torch_intra"], THREADS["torch_inter"])
+    settings = asr_settings()
+    asr_backend(settings).load(settings, cpu_threads or THREADS["ct2"],
+                               WORKERS if WORKER_SHARING == "threads" else 1)
+    if OUTPUT_FORMATS & {"textgrid", "json"} and ALIGN_MODE == "whisperx":
+        aligner().load()
+
+
+def load_shared_models():
+    """Con WORKER_SHARING = "fork": carica qui, prima del fork, il modello di
+    allineamento torch, così i worker ne condividono le pagine (copy-on-write).
+    CTranslate2 e onnxruntime avviano i loro thread già al caricamento e non
+    sopravvivono a un fork: quei modelli li carica ogni worker."""
+    if OUTPUT_FORMATS & {"textgrid", "json"} and ALIGN_MODE == "whisperx" and ALIGN_BACKEND == "torch":
+        # un solo thread nel padre: nessun pool OpenMP da ereditare nei figli,
+        # che poi impostano la loro quota in load_models()
+        set_torch_threads(1)
+        get_align_model(LANGUAGE)
+
 
+def export_onnx_align_model():
+    """Con ALIGN_BACKEND = "onnx" / "onnx-int8" e più worker: esporta (e
+    quantizza) qui, una volta sola, il modello di allineamento, così i worker
+    lo caricano soltanto invece di esportarlo tutti insieme."""
+    if not (OUTPUT_FORMATS & {"textgrid", "json"} and ALIGN_MODE == "whisperx"
+            and ALIGN_BACKEND in ("onnx", "onnx-int8")):
+        return
+    import onnx_align
+    if not onnx_align.onnx_path(LANGUAGE, ALIGN_BACKEND == "onnx-int8").exists():
+        # come load_shared_models: nessun pool OpenMP da ereditare con il fork
+        set_torch_threads(1)
+        onnx_align.export(LANGUAGE, ALIGN_BACKEND == "onnx-int8")
 
-# --------- DEVICE ---------    
-os.environ.setdefault("PYTORCH_ENABLE_MPS_FALLBACK", "1")
-ALIGN_DEVICE = "mps" if torch.backends.mps.is_available() else "cpu"
-print(f"ALIGN device: {ALIGN_DEVICE} (ASR: faster-whisper su CPU)")
 
-# --------- ASR MODEL (CPU) ---------
-try:
-    asr_model = WhisperModel(ASR_MODEL_SIZE, device="cpu", compute_type="int8", cpu_threads=8)
-except ValueError:
-    asr_model = WhisperModel(ASR_MODEL_SIZE, device="cpu", compute_type="float32", cpu_threads=8)
+def asr_settings():
+    """Tutte le impostazioni che cambiano la trascrizione (anche chiave della cache)."""
+    settings = transcription_settings(ASR_MODEL_SIZE, COMPUTE_TYPE, LANGUAGE, VAD_PARAMETERS, BATCH_SIZE,
+                                      CHUNK_SECONDS, word_timestamps=ALIGN_MODE == "whisper",
+                                      escalation_model_size=ESCALATION_MODEL_SIZE,
+                                      escalation_thresholds=ESCALATION_THRESHOLDS)
+    if ASR_BACKEND != "faster-whisper":
+        # anche la VAD è quella del backend (vedi vad_cache)
+        settings["asr_backend"] = {"name": ASR_BACKEND, "rtf": FAKE_RTF}
+    return settings
 
-# --------- ALIGN MODEL ---------
-align_model, align_meta = whisperx.load_align_model(language_code=LANGUAGE, device=ALIGN_DEVICE)
 
+def aligner():
+    """Il backend di allineamento di ALIGN_BACKEND (vedi backends)."""
+    if ALIGN_BACKEND == "fake":
+        return get_backend("align", {"name": "fake", "rtf": FAKE_RTF})
+    return get_backend("align", {"name": "whisperx", "language": LANGUAGE, "runtime": ALIGN_BACKEND,
+                                 "batch_size": ALIGN_BATCH_SIZE,
+                                 "window_pad": ALIGN_WINDOW_PAD if ALIGN_WINDOWED else None,
+                                 "threads": THREADS["torch_intra"]})
 
-try:
-    import epitran
-    epi = epitran.Epitran("ita-Latn")
-    def g2p_words(words):
-        outs = []
+
+def g2p_words(words):
+    epi = get_g2p("ita-Latn")
+    if epi is None:  # fallback vuoto
+        return [[] for _ in words]
+    outs = []
+    with timed("g2p"):
         for w in words:
             phon_str = epi.transliterate(w or "")
 
             tokens = [ch for ch in phon_str if not ch.isspace()]
             outs.append(tokens)
-        return outs
-    G2P_OK = True
-    print("[G2P] Epitran attivo (ita-Latn)")
-except Exception as e:
-    print(f"[G2P] Epitran non disponibile ({e}); il tier g2p_lex verrà omesso.")
-    G2P_OK = False
-    def g2p_words(words):  # fallback vuoto
-        return [[] for _ in words]
+    return outs
 
 # --------- UTIL ---------
 _word_re = re.compile(r"[0-9A-Za-zÀ-ÖØ-öø-ÿ’']+", re.UNICODE)
@@ -107,6 +217,7 @@ def to_textgrid(aligned, out_path: Path):
             if ws is None or we is None or we <= ws: continue
             ws, we = float(ws), float(we)
             words.append((ws, we, lab)); max_end = max(max_end, we)
+            if w.get("segment_level"): continue  # non allineato (ALIGN_TARGETS): niente foni
 
 
             plist = iter_word_phones_safe(w)
@@ -132,7 +243,7 @@ def to_textgrid(aligned, out_path: Path):
 
             # g2p lessicale (Epitran)
             base = normalize_word(lab)
-            if base and G2P_OK:
+            if base and get_g2p("ita-Latn") is not None:
                 g_list = g2p_words([base])[0]  # lista di simboli IPA
                 if g_list:
                     step = (we - ws) / len(g_list)
@@ -157,23 +268,329 @@ def to_textgrid(aligned, out_path: Path):
 
 
 
+# --------- JSON (WhisperX) ---------
+def save_whisperx_json(aligned, out_path: Path):
+    """Write the aligned result in the WhisperX shape read by the word-level
+    scripts in Scripts_JR: {"segments": [{"start", "end", "text", "words": [...]}]}."""
+    data = {
+        "language": LANGUAGE,
+        "segments": aligned.get("segments", []),
+        "word_segments": aligned.get("word_segments", []),
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=float)
+
+
+def output_paths(ap: Path):
+    """Where each output format of an audio file is written."""
+    return {
+        "txt": ap.parent / "transcriptions" / f"{ap.stem}.txt",
+        "textgrid": ap.with_suffix(".TextGrid"),
+        "json": ap.parent / "whisperx_output" / f"{ap.stem}.json",
+    }
+
+
+def targeted(ap: Path, segments):
+    """Con ALIGN_TARGETS, solo i segmenti con candidati dei detector di Scripts_JR."""
+    if not ALIGN_TARGETS:
+        return segments
+    from feature_targets import select_segments
+    return select_segments(segments, ALIGN_TARGETS, ap)
+
+
+def with_unaligned(segments, aligned):
+    """Con ALIGN_TARGETS il TextGrid tiene comunque tutti i segmenti: quelli
+    non allineati (che non si sovrappongono a nessun segmento allineato) vi
+    entrano a livello di segmento, un intervallo con tutto il testo nel tier
+    words, senza foni né g2p."""
+    if not ALIGN_TARGETS:
+        return aligned
+    spans = [(float(seg["start"]), float(seg["end"])) for seg in aligned.get("segments", [])]
+    merged = list(aligned.get("segments", []))
+    for seg in segments:
+        start, end = float(seg["start"]), float(seg["end"])
+        if any(s < end and start < e for s, e in spans):
+            continue
+        merged.append({"start": start, "end": end, "text": seg["text"],
+                       "words": [{"word": seg["text"].strip(), "start": start, "end": end, "segment_level": True}]})
+    merged.sort(key=lambda seg: float(seg["start"]))
+    return {**aligned, "segments": merged}
+
+
+def whisper_word_alignment(segments):
+    """Timestamp di parola del decoder (ALIGN_MODE = "whisper") nella stessa forma
+    di whisperx.align; la probabilità della parola va in "score". Niente foni."""
+    out_segments, word_segments = [], []
+    for seg in segments:
+        words = [{"word": w["word"].strip(), "start": round(w["start"], 3), "end": round(w["end"], 3),
+                  "score": round(w["probability"], 3)}
+                 for w in seg.get("words") or [] if w["word"].strip()]
+        out = {"start": round(seg["start"], 3), "end": round(seg["end"], 3), "text": seg["text"], "words": words}
+        if "features" in seg:
+            out["features"] = seg["features"]
+        out_segments.append(out)
+        word_segments.extend(words)
+    return {"segments": out_segments, "word_segments": word_segments}
+
+
+def align_many(items, settings):
+    """Allineamento parola+fono di più file [(ap, segments)] -> {ap: aligned}.
+    I file già allineati vengono dalla cache; con ALIGN_BATCH_SIZE i segmenti
+    di tutti gli altri passano insieme nel modello, a batch di durata simile."""
+    align_settings = {**settings, "align_language": LANGUAGE}
+    if align_backend() != "whisperx":
+        align_settings.update(align_backend_settings())
+    if ALIGN_TARGETS:
+        align_settings["align_targets"] = ALIGN_TARGETS if ALIGN_TARGETS == "all" else sorted(ALIGN_TARGETS)
+    items = [(ap, targeted(ap, segments)) for ap, segments in items]
+    results, todo = {}, []
+    for ap, segments in items:
+        align_key = transcription_cache.cache_key(ap, align_settings)
+        aligned = transcription_cache.load(align_key) if TRANSCRIPTION_CACHE else None
+        if aligned is None:
+            todo.append((ap, segments, align_key))
+        else:
+            results[ap] = aligned
+    if not todo:
+        return results
+
+    print("[ALIGN] parola+fono…")
+    aligned = align_by_segment({ap: (align_audio(ap), segments) for ap, segments, _ in todo})
+    for ap, _, align_key in todo:
+        transcription_cache.save(align_key, aligned[ap], align_settings)
+        results[ap] = aligned[ap]
+    return results
+
+
+def align_audio(ap: Path):
+    """Audio per l'allineamento: la stessa decodifica usata dall'ASR, memory-mapped,
+    oppure (ALIGN_WINDOWED) letta dal disco una finestra alla volta."""
+    return open_windowed(ap) if ALIGN_WINDOWED else load_audio(ap)
+
+
+def align_backend():
+    """Come viene fatto l'allineamento (entra nelle chiavi della cache)."""
+    if ALIGN_BACKEND != "torch":
+        return ALIGN_BACKEND
+    if ALIGN_BATCH_SIZE:
+        return "batched"
+    return "windowed" if ALIGN_WINDOWED else "whisperx"
+
+
+def align_backend_settings():
+    """align_backend() e i suoi parametri, per le chiavi delle cache: un
+    allineamento a finestre non viene mai preso per uno sull'audio intero."""
+    settings = {"align_backend": align_backend()}
+    if settings["align_backend"] == "windowed":
+        settings["align_window_pad"] = ALIGN_WINDOW_PAD
+    return settings
+
+
+def align_by_segment(jobs):
+    """{ap: (audio, segments)} -> {ap: aligned}, segmento per segmento: con
+    SEGMENT_ALIGN_CACHE solo i segmenti nuovi o modificati passano nel modello."""
+    settings = {"align_language": LANGUAGE, **align_backend_settings()}
+    return segment_align_cache.align_cached(jobs, settings, aligner().align, use_cache=SEGMENT_ALIGN_CACHE)
+
+
+def align_segments(ap: Path, segments, settings):
+    """Allineamento parola+fono con whisperx (o dalla cache, se già fatto).
+    Con ALIGN_MODE = "whisper" usa i timestamp di parola già prodotti dall'ASR."""
+    if ALIGN_MODE == "whisper":
+        return whisper_word_alignment(targeted(ap, segments))
+    return align_many([(ap, segments)], settings)[ap]
+
+
+# --------- STADI ---------
+# process_file() li esegue uno dopo l'altro; con PIPELINE = True girano in
+# thread separati e si sovrappongono tra file diversi.
+# Ogni stadio accredita il suo tempo al file (stage_timing): decode e VAD
+# dentro l'ASR, G2P dentro la scrittura del TextGrid sono contati a parte.
+def asr_stage(ap: Path, _=None):
+    """Un'unica passata ASR (o la trascrizione in cache)."""
+    with stage_timing.for_file(ap), timed("asr"):
+        return list(iter_transcription(ap, asr_settings(), THREADS["ct2"], TRANSCRIPTION_CACHE,
+                                       chunk_workers=CHUNK_WORKERS if WORKERS == 1 else 1))
+
+
+def align_stage(ap: Path, segments):
+    """Allineamento, solo se servono TextGrid o JSON."""
+    aligned = None
+    if OUTPUT_FORMATS & {"textgrid", "json"}:
+        with stage_timing.for_file(ap), timed("align"):
+            aligned = align_segments(ap, segments, asr_settings())
+    return segments, aligned
+
+
+def write_stage(ap: Path, value):
+    """Scrive gli OUTPUT_FORMATS richiesti; ritorna la lista dei file scritti."""
+    segments, aligned = value
+    paths = output_paths(ap)
+    written = []
+    with stage_timing.for_file(ap):
+        if "txt" in OUTPUT_FORMATS:
+            paths["txt"].parent.mkdir(exist_ok=True)
+            with timed("txt"):
+                save_transcription_to_txt(segments, paths["txt"])
+            written.append(paths["txt"])
+        if "textgrid" in OUTPUT_FORMATS:
+            with timed("textgrid"):
+                to_textgrid(with_unaligned(segments, aligned), paths["textgrid"])
+            written.append(paths["textgrid"])
+        if "json" in OUTPUT_FORMATS:
+            paths["json"].parent.mkdir(exist_ok=True)
+            with timed("json"):
+                save_whisperx_json(aligned, paths["json"])
+            written.append(paths["json"])
+    return written
+
+
+def record_timing(ap: Path, error=None):
+    """Chiude i tempi del file e li aggiunge a TIMING_LOG."""
+    stage_timing.finish(ap, audio_duration(ap), TIMING_LOG, error)
+
+
+def process_file(ap: Path):
+    """Un'unica passata ASR per file; da lì escono tutti gli OUTPUT_FORMATS richiesti.
+    Ritorna la lista dei file scritti."""
+    error = None
+    try:
+        return write_stage(ap, align_stage(ap, asr_stage(ap)))
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        record_timing(ap, error)
+
+
+def format_memory(usage):
+    pss = f", PSS {usage['pss'] / 2**30:.2f} GB" if usage["pss"] is not None else ""
+    return f"[MEM] {usage['processes']} processi: RSS {usage['rss'] / 2**30:.2f} GB{pss}"
+
+
 def main():
+    print("Looking in:", AUDIO_DIR.resolve()) #trying to debug path issue
+    if _profile:
+        print(f"Profilo di calibrazione: {COMPUTE_TYPE}, {WORKERS} worker, {CPU_THREADS} thread (RTF {_profile.get('rtf')})")
+
     audio_exts = {".wav", ".mp3", ".m4a", ".flac", ".ogg"}
     files = sorted(p for p in AUDIO_DIR.glob("*") if p.suffix.lower() in audio_exts)
     if not files:
         raise SystemExit(f"Nessun file audio in {AUDIO_DIR}")
 
+    if ALIGN_MODE not in ("whisperx", "whisper"):
+        raise SystemExit(f"ALIGN_MODE non valido: {ALIGN_MODE!r} (scegli tra whisperx, whisper)")
+
+    if ALIGN_BACKEND not in ("torch", "onnx", "onnx-int8", "fake"):
+        raise SystemExit(f"ALIGN_BACKEND non valido: {ALIGN_BACKEND!r} (scegli tra torch, onnx, onnx-int8, fake)")
+    if ASR_BACKEND not in ("faster-whisper", "fake"):
+        raise SystemExit(f"ASR_BACKEND non valido: {ASR_BACKEND!r} (scegli tra faster-whisper, fake)")
+
+    if WORKER_SHARING not in ("none", "fork", "threads"):
+        raise SystemExit(f"WORKER_SHARING non valido: {WORKER_SHARING!r} (scegli tra none, fork, threads)")
+    if WORKER_SHARING == "fork" and sys.platform == "darwin":
+        raise SystemExit('WORKER_SHARING = "fork" non è sicuro su macOS: usa "threads"')
+
+    if ALIGN_TARGETS:
+        from feature_targets import resolve
+        try:
+            resolve(ALIGN_TARGETS)
+        except ValueError as e:
+            raise SystemExit(f"ALIGN_TARGETS non valido: {e}")
+
+    unknown = OUTPUT_FORMATS - {"txt", "textgrid", "json"}
+    if unknown or not OUTPUT_FORMATS:
+        raise SystemExit(f"OUTPUT_FORMATS non valido: {sorted(OUTPUT_FORMATS)} (scegli tra txt, textgrid, json)")
+
+    # Durate dagli header: prima i file più lunghi, e l'ETA
+    if LONGEST_FIRST:
+        files, durations = map(list, zip(*longest_first(files)))
+    else:
+        durations = [audio_duration(p) for p in files]
+    durations = dict(zip(files, durations))
+    eta = EtaTracker(sum(durations.values()))
+    print(f"{len(files)} file, {format_duration(eta.total)} di audio")
+    unit = "thread" if WORKER_SHARING == "threads" and WORKERS > 1 else "processi"
+    print(f"Thread: {THREADS['workers']} {unit} x (ASR {THREADS['ct2']}, torch {THREADS['torch_intra']}"
+          f"+{THREADS['torch_inter']}) su un budget di {CPU_THREADS}")
+    set_torch_threads(THREADS["torch_intra"], THREADS["torch_inter"])
+
+    if WORKERS > 1:
+        export_onnx_align_model()
+        if WORKER_SHARING == "threads":
+            print(f"Worker pool: {WORKERS} thread, modelli condivisi")
+            results = run_threads(files, process_file, WORKERS, initializer=load_models)
+        else:
+            if WORKER_SHARING == "fork":
+                load_shared_models()
+            print(f"Worker pool: {WORKERS} processi ({WORKER_SHARING})")
+            results = run_pool(files, process_file, WORKERS, initializer=load_models,
+                               start_method="fork" if WORKER_SHARING == "fork" else "spawn")
+        for i, (ap, _, error) in enumerate(results):
+            print(f"\n[ASR] {ap.name}")
+            if error is not None:
+                print(f"[ERR] {ap.name}: {error}")
+            if i == 0:
+                # a modelli caricati: quanto occupano davvero tutti i worker
+                print(format_memory(memory_usage(pool_pids())))
+            print(eta.update(durations[ap]))
+        return
+
+    if PIPELINE:
+        pipeline = Pipeline([("asr", asr_stage), ("align", align_stage), ("textgrid", write_stage)],
+                            maxsize=PIPELINE_QUEUE_SIZE)
+        for ap, _, error in pipeline.run(files):
+            print(f"\n[ASR] {ap.name}")
+            if error is not None:
+                print(f"[ERR] {ap.name}: {error}")
+            record_timing(ap, None if error is None else str(error))
+            print(eta.update(durations[ap]))
+        pipeline.report()
+        return
+
+    if ALIGN_BATCH_SIZE and ALIGN_GROUP_FILES > 1 and ALIGN_MODE == "whisperx" and OUTPUT_FORMATS & {"textgrid", "json"}:
+        # allineamento a batch tra file: ASR di un gruppo, poi un unico allineamento
+        for g in range(0, len(files), ALIGN_GROUP_FILES):
+            group = files[g:g + ALIGN_GROUP_FILES]
+            transcribed = []
+            for ap in group:
+                try:
+                    print(f"\n[ASR] {ap.name}")
+                    transcribed.append((ap, asr_stage(ap)))
+                except Exception as e:
+                    print(f"[ERR] {ap.name}: {e}")
+                    record_timing(ap, str(e))
+                    print(eta.update(durations[ap]))
+            errors = {}
+            t0 = time.perf_counter()
+            try:
+                aligned = align_many(transcribed, asr_settings())
+            except Exception as e:
+                aligned = {}
+                errors = {ap: str(e) for ap, _ in transcribed}
+                print(f"[ERR] allineamento di {len(transcribed)} file: {e}")
+            # il tempo del batch va ai file in proporzione alla durata
+            align_time = time.perf_counter() - t0
+            group_audio = sum(durations[ap] for ap, _ in transcribed) or 1.0
+            for ap, segments in transcribed:
+                stage_timing.add(ap, "align", align_time * durations[ap] / group_audio)
+                if ap in aligned:
+                    try:
+                        write_stage(ap, (segments, aligned[ap]))
+                    except Exception as e:
+                        errors[ap] = str(e)
+                        print(f"[ERR] {ap.name}: {e}")
+                record_timing(ap, errors.get(ap))
+                print(eta.update(durations[ap]))
+        return
 
     for ap in files:
         try:
             print(f"\n[ASR] {ap.name}")
-            seg_gen, info = asr_model.transcribe(str(ap), language=LANGUAGE, vad_filter=True)
-            segments = [{"start": float(s.start), "end": float(s.end), "text": s.text} for s in seg_gen]
-            print("[ALIGN] parola+fono…")
-            aligned = whisperx.align(segments, align_model, align_meta, str(ap), ALIGN_DEVICE)
-            to_textgrid(aligned, ap.with_suffix(".TextGrid"))
+            process_file(ap)
         except Exception as e:
             print(f"[ERR] {ap.name}: {e}")
+        print(eta.update(durations[ap]))
 
 
 
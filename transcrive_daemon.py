@@ -0,0 +1,189 @@
+#------------------------------------------
+# transcrive_daemon.py
+#------------------------------------------
+# Long-lived transcription daemon on a Unix socket.
+# The daemon loads the ASR, alignment and Epitran models once and keeps them
+# in memory, so each new file only costs its inference time.
+#
+# Usage:
+#   python transcrive_daemon.py serve                    # start the daemon
+#   python transcrive_daemon.py transcribe a.mp3 b.mp3   # ASR only (+ txt)
+#   python transcrive_daemon.py align a.mp3              # ASR + align + TextGrid
+#   python transcrive_daemon.py stop                     # shut the daemon down
+#
+# Protocol: one JSON request per connection, answered with a stream of JSON
+# lines ({"type": "segment" | "aligned" | "done" | "error", ...}).
+
+import argparse
+import json
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# --------- CONFIG ---------
+SOCKET_PATH = Path(tempfile.gettempdir()) / "jr_transcrive.sock"
+CPU_THREADS = 8
+
+
+def send(wfile, **msg):
+    """Write one JSON line and flush it right away (results are streamed)."""
+    wfile.write((json.dumps(msg, ensure_ascii=False, default=float) + "\n").encode("utf-8"))
+    wfile.flush()
+
+
+# --------- SERVER ---------
+class TranscriptionHandler(socketserver.StreamRequestHandler):
+    """Handle one job. Jobs are served one at a time, so models are never shared
+    between two concurrent inferences."""
+
+    def handle(self):
+        import transcrive
+        from transcription import iter_transcription
+        from transcrive_txt import save_transcription_to_txt
+
+        try:
+            job = json.loads(self.rfile.readline().decode("utf-8"))
+        except ValueError as e:
+            send(self.wfile, type="error", message=f"richiesta non valida: {e}")
+            return
+
+        op = job.get("op")
+        if op == "stop":
+            send(self.wfile, type="done", message="daemon arrestato")
+            # shutdown() waits for serve_forever(), so it must run elsewhere
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+
+        if op not in ("transcribe", "align"):
+            send(self.wfile, type="error", message=f"operazione sconosciuta: {op}")
+            return
+
+        ap = Path(job.get("path", ""))
+        try:
+            if not ap.is_file():
+                raise FileNotFoundError(f"file non trovato: {ap}")
+
+            settings = transcrive.asr_settings()
+            segments = []
+            # the --threads budget of serve, also for the escalation model and the piece pool
+            for seg in iter_transcription(ap, settings, self.server.cpu_threads, transcrive.TRANSCRIPTION_CACHE,
+                                         chunk_workers=transcrive.CHUNK_WORKERS):
+                segments.append(seg)
+                send(self.wfile, type="segment", **seg)
+
+            outputs = []
+            if job.get("txt"):
+                out_txt = Path(job["txt"])
+                out_txt.parent.mkdir(parents=True, exist_ok=True)
+                save_transcription_to_txt(segments, out_txt)
+                outputs.append(str(out_txt))
+
+            if op == "align":
+                aligned = transcrive.align_segments(ap, segments, settings)
+                send(self.wfile, type="aligned", segments=aligned.get("segments", []))
+                out_tg = ap.with_suffix(".TextGrid")
+                transcrive.to_textgrid(transcrive.with_unaligned(segments, aligned), out_tg)
+                outputs.append(str(out_tg))
+
+            send(self.wfile, type="done", path=str(ap), segments=len(segments), outputs=outputs)
+        except Exception as e:
+            send(self.wfile, type="error", path=str(ap), message=str(e))
+
+
+def serve(socket_path: Path, cpu_threads: int) -> None:
+    import transcrive
+    from asr_models import get_g2p
+
+    if socket_path.exists():
+        # A leftover socket from a crashed daemon: refuse only if someone answers
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(str(socket_path))
+            sys.exit(f"ERRORE: un daemon è già attivo su {socket_path}")
+        except OSError:
+            socket_path.unlink()
+
+    # Load everything up front: this is the cost the daemon exists to pay once
+    transcrive.load_models(cpu_threads)
+    get_g2p("ita-Latn")
+
+    with socketserver.UnixStreamServer(str(socket_path), TranscriptionHandler) as server:
+        server.cpu_threads = cpu_threads
+        print(f"[DAEMON] in ascolto su {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if socket_path.exists():
+                socket_path.unlink()
+    print("[DAEMON] arrestato")
+
+
+# --------- CLIENT ---------
+def request(socket_path: Path, job: dict):
+    """Send one job to the daemon and yield the streamed messages."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except OSError:
+            sys.exit(f"ERRORE: nessun daemon su {socket_path} (avvialo con: python transcrive_daemon.py serve)")
+        sock.sendall((json.dumps(job, ensure_ascii=False) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as stream:
+            for line in stream:
+                yield json.loads(line.decode("utf-8"))
+
+
+def submit(socket_path: Path, op: str, files, txt_dir) -> None:
+    from transcrive_txt import format_timestamp
+
+    for ap in files:
+        ap = Path(ap).resolve()
+        job = {"op": op, "path": str(ap)}
+        if txt_dir is not None:
+            job["txt"] = str(Path(txt_dir).resolve() / f"{ap.stem}.txt")
+
+        print(f"\n[{op.upper()}] {ap.name}")
+        for msg in request(socket_path, job):
+            if msg["type"] == "segment":
+                print(f"[{format_timestamp(msg['start'])} - {format_timestamp(msg['end'])}] {msg['text'].strip()}")
+            elif msg["type"] == "aligned":
+                n_words = sum(len(seg.get("words", [])) for seg in msg["segments"])
+                print(f"[ALIGN] {n_words} parole allineate")
+            elif msg["type"] == "done":
+                for out in msg.get("outputs", []):
+                    print(f" ✅ {out}")
+            elif msg["type"] == "error":
+                print(f"[ERR] {ap.name}: {msg['message']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daemon di trascrizione con modelli residenti in memoria.")
+    parser.add_argument("--socket", type=Path, default=SOCKET_PATH, help=f"Unix socket (default: {SOCKET_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="Start the daemon and load the models.")
+    p_serve.add_argument("--threads", type=int, default=CPU_THREADS, help="CPU threads for faster-whisper.")
+
+    for op, help_text in (("transcribe", "ASR only."), ("align", "ASR + alignment + TextGrid.")):
+        p = sub.add_parser(op, help=help_text)
+        p.add_argument("files", nargs="+", help="Audio files to process.")
+        p.add_argument("--txt-dir", default=None, help="Also write <stem>.txt transcripts to this folder.")
+
+    sub.add_parser("stop", help="Shut the daemon down.")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.socket, args.threads)
+    elif args.command == "stop":
+        for msg in request(args.socket, {"op": "stop"}):
+            print(msg.get("message", msg))
+    else:
+        submit(args.socket, args.command, args.files, args.txt_dir)
+
+
+if __name__ == "__main__":
+    main()
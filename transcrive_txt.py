@@ -4,23 +4,52 @@
 # This script takes a audio file and prints its content to a txt file.
 
 import os
+from functools import partial
 from pathlib import Path
-from faster_whisper import WhisperModel
+
+from asr_models import load_profile
+from asr_pool import run_pool, split_threads
+from audio_cache import cached_duration
+from scheduling import EtaTracker, audio_duration, format_duration, longest_first
+from transcription import asr_backend, iter_transcription, transcription_settings
 
 # --------- CONFIG ---------
 AUDIO_DIR = Path("/Users/ginasaviano/Documents/Gent/PhD Materials/JR_audio")  # <--- CAMBIA QUI
 LANGUAGE = "it"
 ASR_MODEL_SIZE = "medium"
+COMPUTE_TYPE = "int8"         # float32 is used automatically if int8 is not supported
+BATCH_SIZE = 0                # >0: decode this many VAD chunks per forward pass (batched mode); 0 = sequential
+CHUNK_SECONDS = 0             # >0: cut long files at VAD silences into pieces of ~this length (e.g. 600)
+CHUNK_WORKERS = 4             # processes transcribing the pieces of one file in parallel (only with WORKERS = 1)
+VAD_PARAMETERS = None         # e.g. {"min_silence_duration_ms": 500}; None = faster-whisper defaults
+TRANSCRIPTION_CACHE = True    # reuse results for audio already transcribed with the same settings
+ESCALATION_MODEL_SIZE = None  # e.g. "large-v3": decode again with this model only the low-confidence segments
+ESCALATION_THRESHOLDS = {"avg_logprob": -0.7, "no_speech_prob": 0.6, "compression_ratio": 2.4}
+CPU_THREADS = 8   # total thread budget, divided among the workers
+WORKERS = 1       # >1: N processes, each with its own model and CPU_THREADS // N threads
+LONGEST_FIRST = True          # process the longest files first (durations read from the headers)
+USE_CALIBRATION = True        # use COMPUTE_TYPE / CPU_THREADS / WORKERS measured by calibrate_asr.py, if any
 
-print("Looking in:", AUDIO_DIR.resolve()) #trying to debug path issue
+# --------- CALIBRATION PROFILE ---------
+# Read at import, so that spawned workers see the same values
+_profile = load_profile(ASR_MODEL_SIZE) if USE_CALIBRATION else {}
+COMPUTE_TYPE = _profile.get("compute_type", COMPUTE_TYPE)
+CPU_THREADS = _profile.get("cpu_threads", CPU_THREADS)
+WORKERS = _profile.get("workers", WORKERS)
 
 # --------- ASR MODEL (CPU) ---------
-try:
-    asr_model = WhisperModel(ASR_MODEL_SIZE, device="cpu", compute_type="int8", cpu_threads=8)
-except ValueError:
-    asr_model = WhisperModel(ASR_MODEL_SIZE, device="cpu", compute_type="float32", cpu_threads=8)
-    
-print(f"Whisper model loaded: {ASR_MODEL_SIZE} on CPU")
+# Loaded lazily on the first transcription (faster_whisper is not imported
+# before that), so an empty AUDIO_DIR exits immediately.
+def load_asr_model(cpu_threads=CPU_THREADS):
+    """Load the ASR model of asr_settings() in this process (once per worker)."""
+    settings = asr_settings()
+    asr_backend(settings).load(settings, cpu_threads)
+
+def asr_settings():
+    """Every setting that changes the transcription (also the cache key, the same as in transcrive.py)."""
+    return transcription_settings(ASR_MODEL_SIZE, COMPUTE_TYPE, LANGUAGE, VAD_PARAMETERS, BATCH_SIZE, CHUNK_SECONDS,
+                                  escalation_model_size=ESCALATION_MODEL_SIZE,
+                                  escalation_thresholds=ESCALATION_THRESHOLDS)
 
 # TIMESTAMP FORMATTING
 def format_timestamp(seconds):
@@ -29,18 +58,71 @@ def format_timestamp(seconds):
     secs = seconds % 60
     return f"{minutes:02d}:{secs:04.1f}"
 
+#FORMAT ONE SEGMENT
+def format_segment_line(seg):
+    """[MM:SS.S - MM:SS.S] text"""
+    start = format_timestamp(seg["start"])
+    end = format_timestamp(seg["end"])
+    text = seg["text"].strip()
+    return f"[{start} - {end}] {text}\n"
+
 #SAVE TRANSCRIPTION TO TXT
 def save_transcription_to_txt(segments, output_path):
     """Save transcription segments to a txt file with timestamps"""
     with open(output_path, "w", encoding="utf-8") as f:
         for seg in segments:
-            start = format_timestamp(seg["start"])
-            end = format_timestamp(seg["end"])
-            text = seg["text"].strip()
-            f.write(f"[{start} - {end}] {text}\n")
+            f.write(format_segment_line(seg))
+
+#STREAM TRANSCRIPTION TO TXT
+def stream_transcription_to_txt(segments, output_path, audio_path=None):
+    """
+    Write each segment as soon as it is produced, so memory does not grow with
+    the file and the partial transcript can already be read in <name>.txt.part.
+    The .part file is renamed to output_path only when the file is complete.
+    With audio_path, live progress is printed in audio seconds.
+    Return the number of segments.
+    """
+    part_path = output_path.with_name(output_path.name + ".part")
+    n_segments = 0
+    total = None
+    with open(part_path, "w", encoding="utf-8") as f:
+        for seg in segments:
+            f.write(format_segment_line(seg))
+            f.flush()
+            n_segments += 1
+            if audio_path is not None:
+                if total is None:
+                    total = cached_duration(audio_path)
+                done = format_timestamp(seg["end"])
+                if total:
+                    print(f"\r    {done} / {format_timestamp(total)} ({min(seg['end'] / total, 1.0):.0%})", end="", flush=True)
+                else:
+                    print(f"\r    {done}", end="", flush=True)
+    if audio_path is not None and n_segments:
+        print()
+    os.replace(part_path, output_path)
+    return n_segments
+
+#TRANSCRIBE ONE FILE
+def transcribe_file(audio_path, transcriptions_dir, show_progress=False):
+    """Transcribe one audio file to <transcriptions_dir>/<stem>.txt.
+    Return (output_txt, number of segments)."""
+    #Transcribe audio (or take it from the transcription cache), one segment at a time
+    # in the pool each worker gets its share of the budget (also for the escalation model)
+    segments = iter_transcription(audio_path, asr_settings(), split_threads(CPU_THREADS, WORKERS), TRANSCRIPTION_CACHE,
+                                  chunk_workers=CHUNK_WORKERS if WORKERS == 1 else 1)
+    
+    #Stream to txt file
+    output_txt = transcriptions_dir / f"{audio_path.stem}.txt"
+    n_segments = stream_transcription_to_txt(segments, output_txt, audio_path if show_progress else None)
+    return output_txt, n_segments
 
 # ------------------------------------------------
 def main():
+    print("Looking in:", AUDIO_DIR.resolve()) #trying to debug path issue
+    if _profile:
+        print(f"Calibration profile: {COMPUTE_TYPE}, {WORKERS} worker(s), {CPU_THREADS} threads (RTF {_profile.get('rtf')})")
+
     audio_exts = {".wav", ".mp3", ".flac", ".m4a", ".aac", ".ogg", ".wma", ".alac"}
     files = sorted(p for p in AUDIO_DIR.glob("*") if p.suffix.lower() in audio_exts)
                    
@@ -51,38 +133,46 @@ def main():
     transcriptions_dir = AUDIO_DIR / "transcriptions"
     transcriptions_dir.mkdir(exist_ok=True)
     
-    print(f"Trovati {len(files)} file audio to process\n")
+    # Durations from the headers: longest files first, and the ETA
+    if LONGEST_FIRST:
+        files, durations = map(list, zip(*longest_first(files)))
+    else:
+        durations = [audio_duration(p) for p in files]
+    durations = dict(zip(files, durations))
+    eta = EtaTracker(sum(durations.values()))
+    
+    print(f"Trovati {len(files)} file audio to process ({format_duration(eta.total)} di audio)\n")
     print(f"Output directory: {transcriptions_dir}\n")
+
+    job = partial(transcribe_file, transcriptions_dir=transcriptions_dir)
+
+    if WORKERS > 1:
+        # Worker pool: results are printed here, in the order files finish
+        threads = split_threads(CPU_THREADS, WORKERS)
+        print(f"Worker pool: {WORKERS} processi x {threads} thread\n")
+        results = run_pool(files, job, WORKERS, initializer=load_asr_model, initargs=(threads,))
+        for i, (audio_path, result, error) in enumerate(results, 1):
+            print(f"[{i}/{len(files)}] Processing: {audio_path.name}")
+            if error is None:
+                output_txt, n_segments = result
+                print (f" ✅ Trascrizione salvata in: {output_txt.name} ({n_segments} segmenti)")
+            else:
+                print(f" ❌ Errore durante la trascrizione di {audio_path.name}: {error}")
+            print(f"    {eta.update(durations[audio_path])}")
+        return
     
     for i, audio_path in enumerate(files, 1):
         try:
             print(f"[{i}/{len(files)}] Processing: {audio_path.name}")
             
-            #Transcribe audio
-            seg_gen, info = asr_model.transcribe(
-                str(audio_path),
-                language=LANGUAGE,
-                vad_filter=True
-            )
-            
-            #Convert Whisper segments to list of dicts
-            segments = [
-                {
-                    "start": float(s.start),
-                    "end": float(s.end),
-                    "text": s.text
-                }
-                for s in seg_gen
-            ]
+            output_txt, n_segments = job(audio_path, show_progress=True)
             
-            #Save to txt file
-            output_txt = transcriptions_dir / f"{audio_path.stem}.txt"
-            save_transcription_to_txt(segments, output_txt)
-            
-            print (f" ✅ Trascrizione salvata in: {output_txt.name} ({len(segments)} segmenti)")
+            print (f" ✅ Trascrizione salvata in: {output_txt.name} ({n_segments} segmenti)")
         
         except Exception as e:
             print(f" ❌ Errore durante la trascrizione di {audio_path.name}: {e}")
+
+        print(f"    {eta.update(durations[audio_path])}")
             
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
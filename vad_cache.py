@@ -0,0 +1,101 @@
+#------------------------------------------
+# vad_cache.py
+#------------------------------------------
+# Persistent cache of Silero VAD speech timestamps (or those of another ASR
+# backend's VAD, see backends).
+# faster-whisper runs VAD over the whole recording on every call with
+# vad_filter=True, even when only the model or the decoding options changed.
+# Here the speech regions of each file are computed once, stored under
+# CACHE_DIR/vad/<key>.json (key = audio content hash + VAD parameters), and
+# handed to the transcription on later runs.
+
+import hashlib
+import json
+import os
+
+from audio_cache import CACHE_DIR, SAMPLE_RATE, audio_hash
+from stage_timing import timed
+
+# The batched pipeline cuts speech into clips of at most this many seconds
+BATCH_CHUNK_LENGTH = 30
+
+
+def vad_options(vad_parameters, batched=False) -> dict:
+    """VAD parameters as faster-whisper would use them for each mode."""
+    params = dict(vad_parameters or {})
+    if batched:
+        # BatchedInferencePipeline defaults
+        params.setdefault("min_silence_duration_ms", 160)
+        params["max_speech_duration_s"] = BATCH_CHUNK_LENGTH
+    return params
+
+
+def _cache_path(audio_path, params: dict, batched: bool, backend="faster-whisper"):
+    key = {"audio": audio_hash(audio_path), "vad": params, "batched": batched}
+    if batched:
+        key["clips"] = False  # speech regions as found; entries without it held merged clips
+    if backend != "faster-whisper":
+        key["backend"] = backend  # Silero keeps the keys it always had
+    payload = json.dumps(key, sort_keys=True)
+    return CACHE_DIR / "vad" / f"{hashlib.sha256(payload.encode('utf-8')).hexdigest()}.json"
+
+
+def merge_for_batches(chunks, max_length=BATCH_CHUNK_LENGTH):
+    """
+    Clips of the batched pipeline, on the concatenated speech of `chunks`:
+    consecutive regions joined, without the silence between them, up to
+    max_length seconds of speech per clip, as faster-whisper's collect_chunks
+    does before decoding (see transcription.iter_segments).
+    """
+    limit = int(max_length * SAMPLE_RATE)
+    merged, t = [], 0
+    for c in chunks:
+        length = c["end"] - c["start"]
+        if merged and t + length - merged[-1]["start"] <= limit:
+            merged[-1]["end"] = t + length
+        else:
+            merged.append({"start": t, "end": t + length})
+        t += length
+    return merged
+
+
+def get_speech_chunks(audio_path, audio, vad_parameters, batched=False, backend=None):
+    """
+    Speech regions of `audio_path` as [{"start": sample, "end": sample}, ...],
+    from the cache or computed with the VAD of the ASR `backend` (default:
+    faster-whisper's Silero VAD).
+    """
+    if backend is None:
+        from backends import FasterWhisperASR
+        backend = FasterWhisperASR()
+    params = vad_options(vad_parameters, batched)
+    path = _cache_path(audio_path, params, batched, backend.name)
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError as e:
+            print(f"Warning: Could not read VAD cache {path.name}: {e}")
+
+    with timed("vad"):
+        chunks = backend.speech_timestamps(audio, params)
+    chunks = [{"start": int(c["start"]), "end": int(c["end"])} for c in chunks]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(chunks, f)
+    os.replace(tmp, path)
+    return chunks
+
+
+def clip_chunks(chunks, offset_samples):
+    """Speech regions after `offset_samples`, relative to that offset
+    (used when only the tail of a file is transcribed)."""
+    clipped = []
+    for c in chunks:
+        if c["end"] <= offset_samples:
+            continue
+        clipped.append({"start": max(c["start"], offset_samples) - offset_samples,
+                        "end": c["end"] - offset_samples})
+    return clipped
@@ -0,0 +1,40 @@
+#------------------------------------------
+# windowed_align.py
+#------------------------------------------
+# Memory-bounded alignment for very long recordings.
+# whisperx.align turns the whole waveform into a tensor and slices each
+# segment out of it, so the memory touched grows with the recording. Here each
+# segment is aligned on its own padded window of audio, read from disk just
+# before use (audio_cache.WindowedAudio): peak memory depends on the longest
+# segment, not on the file duration. Times are shifted into the window and
+# back onto the recording's timeline.
+
+import numpy as np
+
+from audio_cache import SAMPLE_RATE
+
+# audio kept on each side of the segment, so rounding never cuts speech off
+WINDOW_PAD = 0.5
+
+
+def shift_aligned(segments, shift):
+    """Add `shift` seconds to every time of whisperx.align output segments."""
+    for seg in segments:
+        for item in [seg] + seg.get("words", []) + seg.get("chars", []):
+            for k in ("start", "end"):
+                if item.get(k) is not None:
+                    item[k] = round(item[k] + shift, 3)
+    return segments
+
+
+def align_segment_windowed(seg, audio, model, meta, device, pad=WINDOW_PAD):
+    """whisperx.align of one segment on the window [start - pad, end + pad] of `audio`."""
+    import whisperx
+
+    w0 = max(0, int((seg["start"] - pad) * SAMPLE_RATE))
+    w1 = min(len(audio), int((seg["end"] + pad) * SAMPLE_RATE))
+    shift = w0 / SAMPLE_RATE
+    window = np.ascontiguousarray(audio[w0:w1], dtype=np.float32)
+    local = {**seg, "start": seg["start"] - shift, "end": seg["end"] - shift}
+    aligned = whisperx.align([local], model, meta, window, device)
+    return shift_aligned(aligned["segments"], shift)